@@ -1,15 +1,19 @@
 from typing import Optional
+import asyncio
+import io
 import nextcord
 from nextcord.ext import commands, application_checks
-from Mongo import Mongo
-from CommonUtils import validate_phone_number, build_embed_from_json, sanitize_phone_number
+from AsyncMongo import AsyncMongo
+from CommonUtils import validate_phone_number, sanitize_phone_number
 from Views import NotificationsView
+import Metrics
+from Profiling import profiler, memory_profiler, ProfilerBusyError
 
 class AdminCommands(commands.Cog):
     """
     Class which contains all the admin commands
     """
-    def __init__(self, bot, db: Mongo):
+    def __init__(self, bot, db: AsyncMongo):
         self.bot = bot
         self.db = db
     
@@ -31,11 +35,11 @@ class AdminCommands(commands.Cog):
     async def view_profile(self, interaction: nextcord.Interaction, user: nextcord.Member):
         user_id = user.id
         
-        if not self.db.is_user_in_db(user_id):
+        if not await self.db.is_user_in_db(user_id):
             await interaction.response.send_message(f"{user.mention} does not have a profile to view!", ephemeral=True)
             return
         
-        profile = self.db.get_user_profile(user_id)
+        profile = await self.db.get_user_profile(user_id)
         embed = nextcord.Embed(title=f"{user.name}'s TTBTrackr Profile", description=f"Here is {user.name}'s profile information", color=nextcord.Color.blue())
         
         function_map = {"instagram": self._add_ig_to_profile, "phone_number": self._add_phone_to_profile}
@@ -55,10 +59,10 @@ class AdminCommands(commands.Cog):
         """
         Delete a user's profile
         """
-        if not self.db.is_user_in_db(user.id):
+        if not await self.db.is_user_in_db(user.id):
             await interaction.response.send_message(f"{user.mention} does not have a profile to delete!", ephemeral=True)
             return
-        self.db.remove_user(user.id)
+        await self.db.remove_user(user.id)
         await interaction.response.send_message(f"Successfully deleted {user.mention}'s profile", ephemeral=True)
     
     @profile.subcommand(name="edit", description="Forcibly edit a user's profile")
@@ -68,10 +72,10 @@ class AdminCommands(commands.Cog):
         Forcibly edit a user's profile
         """
         
-        if not self.db.is_user_in_db(user.id):
+        if not await self.db.is_user_in_db(user.id):
             await interaction.response.send_message(f"{user.mention} does not have a profile to edit!", ephemeral=True)
             return
-        profile = self.db.get_user_profile(user.id)
+        profile = await self.db.get_user_profile(user.id)
         if not instagram_username:
             profile.pop("instagram")
         if not cell_number:
@@ -86,7 +90,7 @@ class AdminCommands(commands.Cog):
                 await interaction.response.send_message("Invalid phone number. Please try again. Note that this bot only supports Canadian phone numbers for SMS", ephemeral=True)
                 return
             profile["phone_number"]["number"] = sanitize_phone_number(cell_number)
-        self.db.update_user_profile(user.id, profile)
+        await self.db.update_user_profile(user.id, profile)
         await interaction.response.send_message(f"Successfully edited {user.mention}'s profile", ephemeral=True)
     
     @admin.subcommand(name="togglecalls", description="Toggls phone-call notifications for a user")
@@ -95,12 +99,12 @@ class AdminCommands(commands.Cog):
         """
         toggles phone-call notifications for a user
         """
-        if not self.db.is_user_in_db(user.id):
+        if not await self.db.is_user_in_db(user.id):
             await interaction.response.send_message(f"{user.mention} does not have a profile to edit!", ephemeral=True)
         # get the current profile
-        profile = self.db.get_user_profile(user.id)
+        profile = await self.db.get_user_profile(user.id)
         profile["phone_number"]["call_notifications_activated"] = not profile["phone_number"]["call_notifications_activated"]
-        self.db.update_user_profile(user.id, profile)
+        await self.db.update_user_profile(user.id, profile)
         await interaction.response.send_message(f"Successfully toggled phone-call notifications for {user.mention}. Current state: {profile['phone_number']['call_notifications_activated']}", ephemeral=True)
     
     @admin.subcommand(name="uoft", description="UofT admin commands")
@@ -114,10 +118,10 @@ class AdminCommands(commands.Cog):
         """
         Forcibly add an activity for a user to the database
         """
-        if not self.db.is_user_in_db(user.id):
+        if not await self.db.is_user_in_db(user.id):
             await interaction.response.send_message(f"{user.mention} does not have a profile to add activities to!", ephemeral=True)
             return
-        self.db.add_tracked_activity(user.id, course_code, semester, activity)
+        await self.db.add_tracked_activity(user.id, course_code, semester, activity)
         await interaction.response.send_message(f"Successfully added {course_code} {semester} {activity} to {user.mention}'s profile", ephemeral=True)
     
     @uoft.subcommand(name="forceremove", description="Forcibly remove an activity for a user from the database")
@@ -126,12 +130,145 @@ class AdminCommands(commands.Cog):
         """
         Forcibly remove an activity for a user from the database
         """
-        if not self.db.is_user_in_db(user.id):
+        if not await self.db.is_user_in_db(user.id):
             await interaction.response.send_message(f"{user.mention} does not have a profile to remove activities from!", ephemeral=True)
             return
-        self.db.remove_tracked_activity(user.id, course_code, semester, activity)
+        await self.db.remove_tracked_activity(user.id, course_code, semester, activity)
         await interaction.response.send_message(f"Successfully removed {course_code} {semester} {activity} from {user.mention}'s profile", ephemeral=True)
 
+    @uoft.subcommand(name="cache", description="View the TTB API course cache statistics")
+    @application_checks.check(check_if_it_is_me)
+    async def cache(self, interaction: nextcord.Interaction):
+        """
+        View the hit, miss and coalescing counters of the TTB API course cache
+        """
+        uoft = self.bot.get_cog("UofT")
+        if uoft is None:
+            await interaction.response.send_message("The UofT module isn't loaded", ephemeral=True)
+            return
+        stats = uoft.ttbapi.cache.stats()
+        embed = nextcord.Embed(title="TTB API Course Cache", description=f"Entries expire after {stats['ttl']} seconds", color=nextcord.Color.blue())
+        embed.add_field(name="Size", value=f"{stats['size']}/{stats['max_size']}", inline=True)
+        embed.add_field(name="Hit Rate", value=f"{stats['hit_rate']}%", inline=True)
+        embed.add_field(name="In Flight", value=str(stats['inflight']), inline=True)
+        embed.add_field(name="Hits", value=str(stats['hits']), inline=True)
+        embed.add_field(name="Misses", value=str(stats['misses']), inline=True)
+        embed.add_field(name="Coalesced", value=str(stats['coalesced']), inline=True)
+        embed.add_field(name="Evictions", value=str(stats['evictions']), inline=True)
+        embed.add_field(name="Warm-Start Snapshot", value=f"{len(uoft.snapshot.courses)} courses, {'stale' if uoft.snapshot.stale else 'live'}", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    @admin.subcommand(name="metrics", description="View a summary of the bot's runtime metrics")
+    @application_checks.check(check_if_it_is_me)
+    async def metrics(self, interaction: nextcord.Interaction):
+        """
+        Summarises the TTB API, refresh loop and notifier metrics which are also served on the local metrics endpoint
+        """
+        requests = Metrics.ttb_requests
+        latency = Metrics.ttb_request_seconds
+        ticks = Metrics.tick_seconds
+        embed = nextcord.Embed(title="Runtime Metrics", description="Percentiles are estimated from histogram buckets", color=nextcord.Color.blue())
+        statuses = ", ".join(f"{status}: {int(count)}" for (status,), count in sorted(requests.values.items())) or "None yet"
+        embed.add_field(name="TTB Requests", value=statuses, inline=False)
+        embed.add_field(name="TTB Latency", value=f"p50 {latency.percentile(0.5) * 1000:.0f} ms, p99 {latency.percentile(0.99) * 1000:.0f} ms", inline=True)
+        embed.add_field(name="Refresh Ticks", value=f"{ticks.count()} ticks, {int(Metrics.tick_overruns.total())} overran", inline=True)
+        embed.add_field(name="Tick Duration", value=f"p50 {ticks.percentile(0.5) * 1000:.0f} ms, p99 {ticks.percentile(0.99) * 1000:.0f} ms", inline=True)
+        embed.add_field(name="Courses Per Tick", value=f"{Metrics.courses_per_tick.mean():.1f} on average", inline=True)
+        embed.add_field(name="Notification Queue", value=f"{Metrics.notification_queue_depth.get()} events waiting", inline=True)
+        uoft = self.bot.get_cog("UofT")
+        if uoft is not None and uoft.scheduler is not None:
+            schedule = uoft.scheduler.stats()
+            embed.add_field(name="Poll Scheduler", value=f"{schedule['courses']} courses, every {schedule['min_interval']:.0f}/{schedule['median_interval']:.0f}/{schedule['max_interval']:.0f} s (min/median/max), "
+                                                         f"budget {schedule['budget_per_minute']:g}/min, boost x{schedule['boost']:g}", inline=False)
+        failures = ", ".join(f"{channel}: {int(count)}" for (channel,), count in sorted(Metrics.delivery_failures.values.items())) or "None"
+        embed.add_field(name="Delivery Failures", value=failures, inline=True)
+        lag = Metrics.delivery_lag_seconds
+        for channel in ("discord", "sms", "call"):
+            if lag.count(channel):
+                embed.add_field(name=f"Delivery Lag ({channel})", value=f"p50 {lag.percentile(0.5, channel):.1f} s, p99 {lag.percentile(0.99, channel):.1f} s over {lag.count(channel)}", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @admin.subcommand(name="perf", description="Profiling admin commands")
+    @application_checks.check(check_if_it_is_me)
+    async def perf(self, interaction: nextcord.Interaction):
+        pass
+
+    @perf.subcommand(name="ticks", description="Profile the next few refresh ticks with cProfile")
+    @application_checks.check(check_if_it_is_me)
+    async def profile_ticks(self, interaction: nextcord.Interaction, ticks: int = nextcord.SlashOption(name="ticks", description="How many ticks to profile", min_value=1, max_value=50, default=5)):
+        """
+        Profiles the next few refresh ticks and sends the report as a file
+        """
+        if self.bot.get_cog("UofT") is None:
+            await interaction.response.send_message("The UofT module isn't loaded", ephemeral=True)
+            return
+        try:
+            result = profiler.profile_ticks(ticks)
+        except ProfilerBusyError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        try:
+            # The followup has to be sent within Discord's 15 minute interaction window
+            report = await asyncio.wait_for(result, 14 * 60)
+        except asyncio.TimeoutError:
+            profiler.cancel()
+            await interaction.followup.send(f"Gave up waiting for {ticks} ticks. Is the refresh loop running?", ephemeral=True)
+            return
+        await interaction.followup.send(f"Profile of the next {ticks} refresh ticks", file=self._report_file(report, "refresh_profile.txt"), ephemeral=True)
+
+    @perf.subcommand(name="window", description="Profile everything the bot does for a number of seconds with cProfile")
+    @application_checks.check(check_if_it_is_me)
+    async def profile_window(self, interaction: nextcord.Interaction, seconds: int = nextcord.SlashOption(name="seconds", description="How long to profile for", min_value=1, max_value=600, default=30)):
+        """
+        Profiles slash-command handling (and everything else on the event loop) for a window of time and sends the report as a file
+        """
+        if profiler.busy:
+            await interaction.response.send_message("A profile is already running", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        report = await profiler.profile_window(seconds)
+        await interaction.followup.send(f"Profile of the last {seconds} seconds", file=self._report_file(report, "window_profile.txt"), ephemeral=True)
+
+    @perf.subcommand(name="memory", description="Take a tracemalloc snapshot and diff it against the previous one")
+    @application_checks.check(check_if_it_is_me)
+    async def memory_snapshot(self, interaction: nextcord.Interaction, stop: bool = nextcord.SlashOption(name="stop", description="Stop tracing memory allocations instead", default=False)):
+        """
+        Sends the top allocation sites, and what changed since the last snapshot, as a file
+        Tracing starts with the first snapshot and slows the bot down a little until it's stopped
+        """
+        if stop:
+            memory_profiler.stop()
+            await interaction.response.send_message("Stopped tracing memory allocations", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        message = "Memory snapshot" if memory_profiler.tracing else "Started tracing memory allocations"
+        # Snapshots of a large heap take a while, so they're taken off the event loop
+        report = await asyncio.get_running_loop().run_in_executor(None, memory_profiler.snapshot)
+        await interaction.followup.send(f"{message}. Use `/admin perf memory stop:True` to stop tracing", file=self._report_file(report, "memory_snapshot.txt"), ephemeral=True)
+
+    def _report_file(self, report: str, filename: str) -> nextcord.File:
+        return nextcord.File(io.BytesIO(report.encode("utf-8")), filename=filename)
+
+    @admin.subcommand(name="db", description="Database admin commands")
+    @application_checks.check(check_if_it_is_me)
+    async def db_commands(self, interaction: nextcord.Interaction):
+        pass
+
+    @db_commands.subcommand(name="explain", description="Check the query plans of the bot's hot database queries")
+    @application_checks.check(check_if_it_is_me)
+    async def explain(self, interaction: nextcord.Interaction):
+        """
+        Runs explain on each hot query and flags any collection scan
+        """
+        await interaction.response.defer(ephemeral=True)
+        results = await self.db.explain_hot_queries()
+        collscans = [result for result in results if result["collscan"]]
+        embed = nextcord.Embed(title="Hot Query Plans", description=f"{len(collscans)} of {len(results)} queries need a collection scan", color=nextcord.Color.red() if collscans else nextcord.Color.green())
+        for result in results:
+            embed.add_field(name=f"{'⚠️ ' if result['collscan'] else ''}{result['name']} ({result['collection']})", value=f"`{result['stages']}`", inline=False)
+        await interaction.followup.send(embed=embed, ephemeral=True)
 
     def _add_ig_to_profile(self, embed: nextcord.embeds.Embed, profile_data: dict):
         embed.add_field(name="Instagram Username", value=f"[{profile_data['instagram']['username']}](https://instagram.com/{profile_data['instagram']['username']})", inline=False)
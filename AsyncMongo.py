@@ -0,0 +1,67 @@
+# File which contains the awaitable front-end to the Mongo class
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from Mongo import Mongo
+    from WatchIndex import WatchIndex
+
+
+class AsyncMongo:
+    """
+    Class which exposes every public Mongo method as a coroutine.
+    pymongo is blocking, so each call runs on a dedicated thread pool instead of the event loop,
+    which keeps database round trips from stalling Discord's gateway heartbeats.
+    The Mongo instance itself is created by `connect` on that thread pool, so importing pymongo and
+    connecting to the database happen in parallel with the Discord login; calls made before it is ready wait for it.
+    This module deliberately doesn't import pymongo.
+
+    Usage: await database.get_user_profile(user_id) instead of database.get_user_profile(user_id)
+    """
+
+    def __init__(self, connect: Callable[[], Mongo], max_workers: int = 8) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mongo")
+        self.connection = self.executor.submit(connect)
+
+    @property
+    def database(self) -> Mongo:
+        """
+        The underlying Mongo instance. Blocks until it is connected, so only use this off the event loop
+        or after wait_until_connected
+        """
+        return self.connection.result()
+
+    @property
+    def watch_index(self) -> WatchIndex:
+        return self.database.watch_index
+
+    @property
+    def version(self) -> str:
+        return self.database.version
+
+    async def wait_until_connected(self) -> None:
+        """
+        Waits until the Mongo instance has been created and has connected
+        """
+        await asyncio.wrap_future(self.connection)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def run_in_executor(*args, **kwargs):
+            # Looking the method up on the worker thread means it waits for the connection there, not on the event loop
+            return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: getattr(self.database, name)(*args, **kwargs))
+        run_in_executor.__name__ = name
+        # Cache the wrapper so later lookups don't go through __getattr__ again
+        setattr(self, name, run_in_executor)
+        return run_in_executor
+
+    async def close(self) -> None:
+        """
+        Waits for queued database calls to finish, then closes the connection
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+        self.database.close()
@@ -0,0 +1,107 @@
+"""
+Microbenchmark for turning getPageableCourses replies into Course objects.
+Compares the previous model (json + a dict-backed Activity for every section, built eagerly)
+against the current one (orjson when installed + __slots__ classes which build sections lazily),
+for the common case where only one activity of each course is looked at.
+
+Usage (from the repository root): python Benchmarks/course_parsing.py [courses] [sections per course]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Courses import Course
+from TTBAPI import loads
+
+
+class EagerCourse:
+    """
+    The Course model as it was before it used __slots__ and lazy sections
+    """
+
+    def __init__(self, name: str, course_code: str, semester: str) -> None:
+        self.name = name
+        self.course_code = course_code
+        self.semester = semester
+        self.activities = {}
+
+    def add_activity(self, activity):
+        self.activities[activity.name] = activity
+
+    def get_activity(self, name: str):
+        return self.activities[name]
+
+
+class EagerActivity:
+    def __init__(self, name: str, type: str, current_enrollment: int, max_enrollment: int, enrollment_controls: bool, waitlist: int) -> None:
+        self.name = name
+        self.type = type
+        self.current_enrollment = current_enrollment
+        self.max_enrollment = max_enrollment
+        self.enrollment_controls = enrollment_controls
+        self.waitlist = waitlist
+
+
+def build_reply(courses: int, sections: int) -> bytes:
+    types = ["LEC", "TUT", "PRA"]
+    return json.dumps({"payload": {"pageableCourse": {"total": courses, "courses": [{
+        "name": f"Course {i}",
+        "code": f"CSC{i:03d}H5",
+        "sectionCode": "F",
+        "sections": [{
+            "name": f"{types[j % 3]}{j:04d}",
+            "type": types[j % 3],
+            "currentEnrolment": j * 7 % 300,
+            "maxEnrolment": 300,
+            "currentWaitlist": 0,
+            "openLimitInd": "N",
+            "instructors": [{"firstName": "Ada", "lastName": "Lovelace"}],
+            "meetingTimes": [{"start": {"day": j % 5 + 1, "millisofday": 36000000}, "end": {"day": j % 5 + 1, "millisofday": 39600000}, "building": {"buildingCode": "DV", "buildingRoomNumber": "2074"}}],
+        } for j in range(sections)],
+    } for i in range(courses)]}}}).encode()
+
+
+def parse_eager(body: bytes) -> list:
+    to_return = []
+    for course in json.loads(body)["payload"]["pageableCourse"]["courses"]:
+        parsed = EagerCourse(course["name"], course["code"], course["sectionCode"])
+        for activity in course["sections"]:
+            parsed.add_activity(EagerActivity(activity["name"], activity["type"], activity["currentEnrolment"], activity["maxEnrolment"], activity["openLimitInd"] != "N", activity.get("currentWaitlist", 0)))
+        parsed.get_activity("LEC0000")
+        to_return.append(parsed)
+    return to_return
+
+
+def parse_lazy(body: bytes) -> list:
+    to_return = []
+    for course in loads(body)["payload"]["pageableCourse"]["courses"]:
+        parsed = Course.from_payload(course)
+        parsed.get_activity("LEC0000")
+        to_return.append(parsed)
+    return to_return
+
+
+def measure(label: str, parse, body: bytes, courses: int, repeats: int = 5) -> None:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse(body)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = parse(body)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    print(f"{label:<32} {best * 1000:8.2f} ms   {best / courses * 1e6:7.2f} us/course   {memory / courses / 1024:7.2f} KiB/course")
+
+
+if __name__ == "__main__":
+    courses = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sections = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    body = build_reply(courses, sections)
+    print(f"{courses} courses x {sections} sections, {len(body) / 1e6:.1f} MB reply, decoder: {loads.__module__}")
+    measure("eager json + dict objects", parse_eager, body, courses)
+    measure("lazy + __slots__", parse_lazy, body, courses)
@@ -0,0 +1,242 @@
+"""
+End-to-end load benchmark for the UofT cog's refresh loop.
+Drives UofT.refresh tick after tick against the local TTB stand-in (Benchmarks/ttb_standin.py),
+with an in-memory stand-in for Mongo and fake Discord/Twilio senders, so nothing leaves the machine.
+Every notification goes through UofT._contact_users and the real NotificationDispatcher.
+
+Reports ticks per second, p50/p99 tick duration and CPU time, and p50/p99 latency from a vacancy being detected
+(and from the section opening on the stand-in) to the notification being delivered.
+
+Usage (from the repository root): python Benchmarks/refresh_load.py --courses 500 --users 2000 --ticks 30
+Run with --help for the latency, error and churn options.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from AsyncMongo import AsyncMongo
+from WatchIndex import WatchIndex
+from ttb_standin import TTBStandIn
+
+
+class MemoryMongo:
+    """
+    In-memory stand-in for the Mongo methods the refresh loop and the notifier use
+    With keep_subscriptions, notified users stay subscribed, so the load stays the same from tick to tick
+    """
+
+    def __init__(self, keep_subscriptions: bool = True) -> None:
+        self.version = "MemoryMongo"
+        self.watch_index = WatchIndex()
+        self.profiles = {}
+        self.dlcs = {}
+        self.sections = {}
+        self.keep_subscriptions = keep_subscriptions
+
+    def get_user_profiles(self, user_ids: list) -> dict:
+        return {user_id: self.profiles[user_id] for user_id in user_ids if user_id in self.profiles}
+
+    def get_user_dlcs(self, user_ids: list) -> dict:
+        return {user_id: self.dlcs[user_id] for user_id in user_ids if user_id in self.dlcs}
+
+    def remove_tracked_activity_for_users(self, user_ids: list, course_code: str, semester: str, activity: str) -> None:
+        if self.keep_subscriptions:
+            return
+        for user_id in user_ids:
+            self.watch_index.remove(user_id, course_code, semester, activity)
+
+    def add_course_sections(self, course_code: str, semester: str, activity_type: str, sections: list) -> None:
+        self.sections.setdefault((course_code, semester, activity_type), set()).update(sections)
+
+    def get_course_sections(self, course_code: str, semester: str, activity_type: str) -> list:
+        return list(self.sections.get((course_code, semester, activity_type), ()))
+
+    def is_course_sections_in_database(self, course_code: str, semester: str, activity_type: str) -> bool:
+        return bool(self.sections.get((course_code, semester, activity_type)))
+
+    def close(self) -> None:
+        pass
+
+
+class FakeUser:
+    def __init__(self, bot, user_id: int) -> None:
+        self.bot = bot
+        self.id = user_id
+
+    async def send(self, message: str) -> None:
+        if self.bot.send_latency:
+            await asyncio.sleep(self.bot.send_latency)
+        self.bot.delivered.append((self.id, message, time.monotonic()))
+
+
+class FakeBot:
+    """
+    Stand-in for the nextcord bot: "sending" a DM only records when it happened
+    """
+
+    def __init__(self, send_latency: float) -> None:
+        self.send_latency = send_latency
+        self.delivered = []
+        self.loop = asyncio.get_running_loop()
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+    def get_user(self, user_id: int) -> FakeUser:
+        return FakeUser(self, user_id)
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        return FakeUser(self, user_id)
+
+
+class FakeContact:
+    """
+    Stand-in for UserContact: "sending" an SMS blocks its Twilio thread for sms_latency, then records when it happened
+    """
+
+    def __init__(self, sms_latency: float) -> None:
+        self.sms_latency = sms_latency
+        self.delivered = []
+        self.version = "FakeContact"
+
+    def contact_user(self, profile: dict, message: str, dlc: dict) -> list:
+        time.sleep(self.sms_latency)
+        self.delivered.append((dlc["_id"], message, time.monotonic()))
+        return ["sms"]
+
+
+def percentiles(values: list) -> str:
+    if not values:
+        return "p50       - ms   p99       - ms"
+    values = sorted(values)
+    return f"p50 {values[len(values) // 2] * 1000:9.2f} ms   p99 {values[max(0, int(len(values) * 0.99) - 1)] * 1000:9.2f} ms"
+
+
+def populate(database: MemoryMongo, standin: TTBStandIn, users: int, activities_per_user: int, sms_fraction: float, seed: int) -> int:
+    """
+    Subscribes every user to random activities of the stand-in's catalog, and gives sms_fraction of them SMS notifications
+    Returns the number of (user, activity) subscriptions
+    """
+    rng = random.Random(seed)
+    subscriptions = 0
+    for user_id in range(1, users + 1):
+        for course in rng.sample(standin.courses, min(activities_per_user, len(standin.courses))):
+            section = rng.choice(course["sections"])
+            database.watch_index.add(user_id, course["code"], course["sectionCode"], section["name"])
+            subscriptions += 1
+        if rng.random() < sms_fraction:
+            database.profiles[user_id] = {"phone_number": {"number": "+14165550100", "confirmed": True, "SMS": True, "call": False}}
+            database.dlcs[user_id] = {"_id": user_id, "SMS_enabled": True, "call_enabled": False}
+    return subscriptions
+
+
+async def main(options: argparse.Namespace) -> None:
+    # The cog reads its settings from the environment; poll every tracked course on every tick, with no
+    # rate limiting, and keep its files out of the repository
+    workdir = tempfile.mkdtemp(prefix="ttb-load-")
+    os.environ.update({
+        "TTB_POLLING_MODE": options.mode,
+        "TTB_CONCURRENCY": str(options.concurrency),
+        "TTB_RATE_LIMIT": "0",
+        "TTB_HEDGE_AFTER": str(options.hedge_after / 1000),
+        "POLL_BASE_INTERVAL": "0.001",
+        "POLL_MIN_INTERVAL": "0.001",
+        "POLL_BUDGET_PER_MINUTE": "1e12",
+        "WARM_START_FILE": os.path.join(workdir, "warm_start.bin"),
+        "HISTORY_DIRECTORY": os.path.join(workdir, "history"),
+    })
+    # enrolment_windows.json is looked up relative to the working directory
+    os.chdir(ROOT)
+    from UofT import UofT
+
+    standin = TTBStandIn(options.courses, options.sections, options.latency / 1000, options.jitter / 1000, options.error_rate, options.churn, seed=options.seed)
+    url = await standin.start()
+    memory = MemoryMongo(keep_subscriptions=not options.untrack)
+    subscriptions = populate(memory, standin, options.users, options.activities_per_user, options.sms_fraction, options.seed)
+    database = AsyncMongo(lambda: memory)
+    bot = FakeBot(options.send_latency / 1000)
+    contact = FakeContact(options.sms_latency / 1000)
+
+    uoft = UofT(bot, database, contact)
+    # Ticks are driven by hand below instead of by the task loop
+    uoft.refresh.cancel()
+    uoft.ttbapi.url = url
+    await uoft.before_refresh()
+
+    # Remember when each notification was detected, and when its section opened on the stand-in
+    detected = {}
+    contact_users = uoft._contact_users
+    async def record_detection(users, course_code, semester, activity, message):
+        now = time.monotonic()
+        opened = standin.opened_at.get((course_code, semester, activity), now)
+        for user in users:
+            detected.setdefault((user, message), (now, opened))
+        await contact_users(users, course_code, semester, activity, message)
+    uoft._contact_users = record_detection
+
+    print(f"{options.courses} courses x {options.sections} sections, {options.users} users, {subscriptions} subscriptions, "
+          f"{options.mode} mode, stand-in latency {options.latency:g}+{options.jitter:g} ms, error rate {options.error_rate:g}, churn {options.churn:g}")
+    durations = []
+    cpu_times = []
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(options.ticks):
+        tick_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            await uoft.refresh()
+        except Exception as e:
+            failures += 1
+            if failures == 1:
+                print(f"Tick failed: {type(e).__name__}: {e}")
+        durations.append(time.perf_counter() - tick_start)
+        cpu_times.append(time.process_time() - cpu_start)
+    elapsed = time.perf_counter() - start
+    try:
+        await asyncio.wait_for(uoft.notifier.queue.join(), 60)
+    except asyncio.TimeoutError:
+        print("Notifications were still being delivered after 60 s")
+
+    discord_lag = [delivered_at - detected[(user, message)][0] for user, message, delivered_at in bot.delivered if (user, message) in detected]
+    opening_lag = [delivered_at - detected[(user, message)][1] for user, message, delivered_at in bot.delivered if (user, message) in detected]
+    sms_lag = [delivered_at - detected[(user, message)][0] for user, message, delivered_at in contact.delivered if (user, message) in detected]
+    print(f"ticks                     {options.ticks} ({failures} failed), {options.ticks / elapsed:.2f} ticks/s, {standin.requests} requests, {standin.errors} errors")
+    print(f"tick duration             {percentiles(durations)}")
+    print(f"tick CPU time             {percentiles(cpu_times)}")
+    print(f"detection -> Discord      {percentiles(discord_lag)}   ({len(discord_lag)} messages)")
+    print(f"detection -> SMS          {percentiles(sms_lag)}   ({len(sms_lag)} messages)")
+    print(f"section opened -> Discord {percentiles(opening_lag)}")
+
+    await uoft.notifier.stop()
+    await uoft.ttbapi.close()
+    await database.close()
+    await standin.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--courses", type=int, default=500, help="number of courses in the stand-in's catalog")
+    parser.add_argument("--sections", type=int, default=6, help="sections per course")
+    parser.add_argument("--users", type=int, default=2000, help="number of users")
+    parser.add_argument("--activities-per-user", type=int, default=3, help="activities each user tracks, in different courses")
+    parser.add_argument("--sms-fraction", type=float, default=0.2, help="share of users who also get SMS notifications")
+    parser.add_argument("--ticks", type=int, default=30, help="number of refresh ticks to run, back to back")
+    parser.add_argument("--mode", choices=["course", "grouped", "snapshot"], default="course", help="TTB_POLLING_MODE")
+    parser.add_argument("--concurrency", type=int, default=8, help="TTB_CONCURRENCY")
+    parser.add_argument("--latency", type=float, default=5, help="stand-in reply latency, in ms")
+    parser.add_argument("--jitter", type=float, default=5, help="random extra stand-in latency of up to this many ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stand-in replies which are 500 errors")
+    parser.add_argument("--churn", type=float, default=0.05, help="chance a section opens or fills up each time it's served")
+    parser.add_argument("--hedge-after", type=float, default=0, help="TTB_HEDGE_AFTER in ms, 0 to disable hedging")
+    parser.add_argument("--send-latency", type=float, default=20, help="time a Discord DM takes to send, in ms")
+    parser.add_argument("--sms-latency", type=float, default=150, help="time an SMS takes to send, in ms")
+    parser.add_argument("--untrack", action="store_true", help="untrack users once notified, like the bot does, instead of keeping the load constant")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,158 @@
+"""
+Local stand-in for the TTB API's getPageableCourses endpoint, for benchmarks and load tests which
+shouldn't depend on (or hammer) UofT's servers.
+It serves a synthetic catalog of configurable size, and can add latency, fail a share of requests,
+and churn enrolment so that sections open and fill up between polls.
+
+Requests with a course code return every course whose code starts with it (in the requested semester, if any),
+like the real API. Requests with an empty course code page through the whole catalog.
+
+Usage (from the repository root): python Benchmarks/ttb_standin.py [courses] [port]
+Then point TTBAPI at http://127.0.0.1:<port>/ttb/getPageableCourses
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from aiohttp import web
+
+DEPARTMENTS = ["CSC", "MAT", "STA", "BIO", "CHM", "ECO", "PSY", "HIS", "PHL", "ENG"]
+TYPES = ["LEC", "TUT", "PRA"]
+
+
+class TTBStandIn:
+    """
+    Class which serves a synthetic catalog over HTTP
+
+    courses: number of courses, spread over DEPARTMENTS and alternating between the F and S semesters
+    sections: number of sections per course
+    latency / jitter: seconds added to every reply, plus a uniformly random extra of up to jitter
+    error_rate: share of requests answered with a 500 instead
+    churn: chance that a section changes state (full <-> open) each time its course is served
+    full_fraction: share of sections which start out full
+    """
+
+    def __init__(self, courses: int = 1000, sections: int = 6, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, churn: float = 0.05, full_fraction: float = 0.5, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.churn = churn
+        self.courses = []
+        for i in range(courses):
+            department = DEPARTMENTS[i % len(DEPARTMENTS)]
+            course_sections = []
+            for j in range(sections):
+                maximum = self.random.choice([30, 60, 120, 300])
+                full = self.random.random() < full_fraction
+                course_sections.append({
+                    "name": f"{TYPES[j % len(TYPES)]}{j + 1:04d}",
+                    "type": TYPES[j % len(TYPES)],
+                    "currentEnrolment": maximum if full else self.random.randrange(maximum),
+                    "maxEnrolment": maximum,
+                    "currentWaitlist": 0,
+                    "openLimitInd": "N",
+                })
+            self.courses.append({
+                "name": f"Synthetic Course {i}",
+                "code": f"{department}{100 + i // len(DEPARTMENTS):03d}H5",
+                "sectionCode": "F" if i % 2 == 0 else "S",
+                "sections": course_sections,
+            })
+        # (course code, semester, section) -> time.monotonic() of the last time it went from full to open,
+        # so a benchmark running in the same process can measure opening-to-notification latency
+        self.opened_at = {}
+        # Course code -> indexes in self.courses, so exact lookups don't scan the whole catalog
+        self.by_code = {}
+        for index, course in enumerate(self.courses):
+            self.by_code.setdefault(course["code"], []).append(index)
+        # Index in self.courses -> the course's JSON, so unchanged courses aren't encoded again (and stay byte-for-byte the same)
+        self.encoded = {}
+        self.requests = 0
+        self.errors = 0
+        self.runner = None
+
+    def keys(self) -> list[tuple[str, str]]:
+        """
+        Returns the (course code, semester) of every course in the catalog
+        """
+        return [(course["code"], course["sectionCode"]) for course in self.courses]
+
+    def _churn(self, index: int, course: dict) -> None:
+        for section in course["sections"]:
+            if self.random.random() >= self.churn:
+                continue
+            self.encoded.pop(index, None)
+            if section["currentEnrolment"] >= section["maxEnrolment"]:
+                section["currentEnrolment"] = section["maxEnrolment"] - 1
+                self.opened_at[(course["code"], course["sectionCode"], section["name"])] = time.monotonic()
+            else:
+                section["currentEnrolment"] = section["maxEnrolment"]
+
+    def _match(self, payload: dict) -> list[int]:
+        """
+        Returns the indexes of the courses which match a request
+        """
+        props = payload["courseCodeAndTitleProps"]
+        code, semester = props["courseCode"], props["courseSectionCode"]
+        if not code:
+            page, size = payload.get("page", 1), payload.get("pageSize", 1625)
+            return list(range(len(self.courses)))[(page - 1) * size:page * size]
+        if code in self.by_code:
+            candidates = self.by_code[code]
+        else:
+            candidates = [index for index, course in enumerate(self.courses) if course["code"].startswith(code)]
+        return [index for index in candidates if not semester or self.courses[index]["sectionCode"] == semester]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=500, text="Internal Server Error")
+        indexes = self._match(payload)
+        encoded = []
+        for index in indexes:
+            self._churn(index, self.courses[index])
+            if index not in self.encoded:
+                self.encoded[index] = json.dumps(self.courses[index])
+            encoded.append(self.encoded[index])
+        body = f'{{"payload": {{"pageableCourse": {{"courses": [{", ".join(encoded)}], "total": {len(encoded)}}}}}}}'
+        return web.Response(text=body, content_type="application/json")
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Starts serving, and returns the URL of the getPageableCourses endpoint
+        """
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/ttb/getPageableCourses", self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/ttb/getPageableCourses"
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+async def main(courses: int, port: int) -> None:
+    standin = TTBStandIn(courses)
+    url = await standin.start(port=port)
+    print(f"Serving {courses} synthetic courses at {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 8080))
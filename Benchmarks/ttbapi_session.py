@@ -0,0 +1,85 @@
+"""
+Benchmark which compares per-request latency of the TTB API client with a new aiohttp session
+for every request (the old approach) against the pooled, keep-alive session TTBAPI now owns.
+A local stand-in server replaces api.easi.utoronto.ca so the numbers don't depend on UofT's servers.
+
+Usage (from the repository root): python Benchmarks/ttbapi_session.py [requests]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from TTBAPI import TTBAPI
+
+REPLY = {
+    "payload": {
+        "pageableCourse": {
+            "courses": [{
+                "name": "Introduction to Computer Science",
+                "code": "CSC148H5",
+                "sectionCode": "F",
+                "sections": [{"name": "LEC0101", "type": "Lecture", "currentEnrolment": 250, "maxEnrolment": 300, "openLimitInd": "N"}],
+            }],
+            "total": 1,
+        }
+    }
+}
+
+
+async def _handle(request: web.Request) -> web.Response:
+    await request.read()
+    return web.json_response(REPLY)
+
+
+async def _start_server() -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_post("/ttb/getPageableCourses", _handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/ttb/getPageableCourses"
+
+
+async def _new_session_per_request(api: TTBAPI) -> None:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(api.url, headers=api.headers, json=api._build_payload("CSC148H5", "F")) as response:
+            await response.read()
+
+
+async def _pooled_session(api: TTBAPI) -> None:
+    # The raw request, so neither the course cache nor the rate limiter is being timed
+    await api._request_body("CSC148H5", "F")
+
+
+async def _time(label: str, request, api: TTBAPI, count: int) -> None:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await request(api)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"{label:<28} mean {statistics.mean(latencies):7.3f} ms   p50 {latencies[len(latencies) // 2]:7.3f} ms   p99 {latencies[int(len(latencies) * 0.99) - 1]:7.3f} ms")
+
+
+async def main(count: int) -> None:
+    runner, url = await _start_server()
+    api = TTBAPI(url=url, rate_limit=0, cache_ttl=0)
+    try:
+        print(f"{count} sequential requests against {url}")
+        await _time("new session per request", _new_session_per_request, api, count)
+        await _time("pooled keep-alive session", _pooled_session, api, count)
+    finally:
+        await api.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,94 @@
+# File which contains the cache in front of TTBAPI.get_course
+from __future__ import annotations
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from Courses import Course
+
+
+class CourseCache:
+    """
+    Class which caches Course objects by (course code, semester) for `ttl` seconds
+    At most `max_size` courses are kept; the least recently used one is evicted first.
+    Concurrent callers asking for the same course share a single in-flight request
+    """
+
+    def __init__(self, ttl: float = 15, max_size: int = 2048) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key: tuple[str, str]) -> Course | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, course = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return course
+
+    def put(self, key: tuple[str, str], course: Course, ttl: float = None) -> None:
+        """
+        Stores a course in the cache for ttl seconds (the cache's TTL by default),
+        evicting the least recently used courses if it is full
+        """
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), course)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: tuple[str, str], fetch: Callable[[], Awaitable[Course]]) -> Course:
+        """
+        Returns the cached course for key, calling fetch to load it on a miss
+        If another caller is already fetching key, waits for that request instead of making a new one.
+        Exceptions raised by fetch are passed on to every waiting caller and nothing is cached
+        """
+        course = self._lookup(key)
+        if course is not None:
+            self.hits += 1
+            return course
+        if key in self.inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self.inflight[key])
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            course = await fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting on it
+            future.exception()
+            raise
+        else:
+            self.put(key, course)
+            future.set_result(course)
+            return course
+        finally:
+            del self.inflight[key]
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the cache's counters
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self.inflight),
+            "hit_rate": round((self.hits + self.coalesced) / lookups * 100, 1) if lookups else 0,
+        }
@@ -1,27 +1,66 @@
 # File which contains all classes relevant to the TTB API replies
 from __future__ import annotations
+from sys import intern
+from typing import Iterator
+
+
 class Course:
     """
     Class which represents a course in a TTB API reply
+    Only the enrolment fields of each section are kept from the reply, as one small tuple per section,
+    and they are only turned into Activity objects when asked for. Sections are indexed by type once, on first use
     """
-    
-    def __init__(self, name: str, course_code: str, semester: str) -> None:
+    __slots__ = ("name", "course_code", "semester", "_sections", "_by_type", "_activities")
+
+    def __init__(self, name: str, course_code: str, semester: str, sections: dict[str, tuple] = None) -> None:
         self.name = name
         self.course_code = course_code
         self.semester = semester
-        self.activities = {}
-    
+        # Section name -> (type, current enrolment, max enrolment, enrolment controls, waitlist)
+        self._sections = sections if sections is not None else {}
+        self._by_type = None
+        self._activities = {}
+
+    @classmethod
+    def from_payload(cls, course: dict) -> Course:
+        """
+        Builds a Course from a single entry of a getPageableCourses reply, without building any Activity objects yet
+        """
+        return cls(course['name'], course['code'], course['sectionCode'], {
+            section['name']: (intern(section['type']), section['currentEnrolment'], section['maxEnrolment'], section['openLimitInd'] != 'N', section.get('currentWaitlist', 0))
+            for section in course['sections']
+        })
+
+    def to_record(self) -> tuple[str, str, str, dict[str, tuple]]:
+        """
+        Returns the course as plain data, for saving to disk
+        """
+        return (self.name, self.course_code, self.semester, self._sections)
+
+    @classmethod
+    def from_record(cls, record: tuple[str, str, str, dict[str, tuple]]) -> Course:
+        """
+        Rebuilds a course saved with to_record. The sections may have come back from JSON as lists
+        """
+        name, course_code, semester, sections = record
+        return cls(name, course_code, semester, {section_name: (intern(section[0]), *section[1:]) for section_name, section in sections.items()})
+
     def add_activity(self, activity: Activity):
-        self.activities[activity.name] = activity
+        self._sections[activity.name] = (activity.type, activity.current_enrollment, activity.max_enrollment, activity.enrollment_controls, activity.waitlist)
+        self._activities[activity.name] = activity
+        self._by_type = None
 
     def get_activity(self, name: str) -> Activity:
         """
         Returns the activity with the given name
         Raises KeyError if the activity does not exist
         """
-        if name not in self.activities:
-            raise KeyError(f"Activity {name} does not exist")
-        return self.activities[name]
+        activity = self._activities.get(name)
+        if activity is None:
+            if name not in self._sections:
+                raise KeyError(f"Activity {name} does not exist")
+            activity = self._activities[name] = Activity(name, *self._sections[name])
+        return activity
 
     def get_name(self) -> str:
         """
@@ -33,34 +72,49 @@ class Course:
         """
         Returns a list of all the names of the activities in this course
         """
-        return list(self.activities.keys())
-    
+        return list(self._sections)
+
+    def section_enrolments(self) -> Iterator[tuple[str, int, int, int, bool]]:
+        """
+        Yields (name, current enrolment, max enrolment, waitlist, enrolment controls) for every section,
+        without building Activity objects
+        """
+        for name, (_, current, maximum, enrollment_controls, waitlist) in self._sections.items():
+            yield name, current, maximum, waitlist, enrollment_controls
+
     def get_tuts(self) -> list[str]:
         """
         Returns a list of all the tutorial names
         """
-        return list(filter(lambda x: "TUT" in x, self.activities.keys()))
+        return self.get_activity_by_type("TUT")
 
     def get_lecs(self) -> list[str]:
         """
         Returns a list of all the lecture names
         """
-        return list(filter(lambda x: "LEC" in x, self.activities.keys()))
-    
+        return self.get_activity_by_type("LEC")
+
     def get_pra(self) -> list[str]:
         """
         Returns a list of all the practical names
         """
-        return list(filter(lambda x: "PRA" in x, self.activities.keys()))
-    
+        return self.get_activity_by_type("PRA")
+
     def get_activity_by_type(self, type: str) -> list[str]:
         """
         Returns a list of all the activities of the given type
         Precondition: type is one of "LEC", "TUT", or "PRA"
         """
-        return list(filter(lambda x: type in x, self.activities.keys()))
+        if self._by_type is None:
+            self._by_type = {}
+            for name in self._sections:
+                self._by_type.setdefault(name[:3], []).append(name)
+        return list(self._by_type.get(type, []))
+
 
 class Activity:
+    __slots__ = ("name", "type", "current_enrollment", "max_enrollment", "enrollment_controls", "waitlist")
+
     def __init__(self, name: str, type: str, current_enrollment: int, max_enrollment: int, enrollment_controls: bool, waitlist: int) -> None:
         self.name = name
         self.type = type
@@ -68,10 +122,26 @@ class Activity:
         self.max_enrollment = max_enrollment
         self.enrollment_controls = enrollment_controls
         self.waitlist = waitlist
-    
+
     def is_seats_free(self) -> bool:
         """
         Returns whether or not this activity has seats free
         """
         return self.current_enrollment < self.max_enrollment and not self.enrollment_controls and self.waitlist == 0
-        
\ No newline at end of file
+
+
+class CatalogSnapshot:
+    """
+    Class which represents every course in the TTB API at one point in time
+    `courses` maps (course code, section code) to each Course, and each course indexes its activities by name,
+    so looking up (course code, section code, activity name) doesn't depend on the size of the catalog
+    """
+
+    def __init__(self) -> None:
+        self.courses = {}
+
+    def add_course(self, course: Course):
+        self.courses[(course.course_code, course.semester)] = course
+
+    def __len__(self) -> int:
+        return len(self.courses)
@@ -0,0 +1,137 @@
+# File which contains the registry of embed templates loaded from Embeds/
+from __future__ import annotations
+import asyncio
+import json
+import os
+import nextcord
+
+
+class EmbedTemplate:
+    """
+    Class which stores one validated embed template in the shape nextcord.Embed needs,
+    so building an Embed from it doesn't touch the disk or re-parse JSON
+    """
+    __slots__ = ("title", "description", "color", "fields", "footer")
+
+    def __init__(self, data: dict) -> None:
+        self.title = data["title"]
+        self.description = data["description"]
+        self.color = data["color"]
+        self.fields = tuple((field["name"], field["value"], field["inline"]) for field in data["fields"])
+        self.footer = data.get("footer")
+
+    @staticmethod
+    def validate(data, name: str) -> None:
+        """
+        Raises ValueError if the parsed JSON isn't a valid embed template
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Embed template {name} isn't a JSON object")
+        for key, kind in (("title", str), ("description", str), ("color", int), ("fields", list)):
+            if not isinstance(data.get(key), kind):
+                raise ValueError(f"Embed template {name} needs a {kind.__name__} '{key}'")
+        if "footer" in data and not isinstance(data["footer"], str):
+            raise ValueError(f"Embed template {name} has a footer which isn't a string")
+        for index, field in enumerate(data["fields"]):
+            if not isinstance(field, dict) or not isinstance(field.get("name"), str) or not isinstance(field.get("value"), str) or not isinstance(field.get("inline"), bool):
+                raise ValueError(f"Field {index} of embed template {name} needs a string 'name' and 'value' and a boolean 'inline'")
+
+    def build(self, title: str = None, description: str = None, footer: str = None, field_values: dict[int, str] = None) -> nextcord.Embed:
+        """
+        Returns a new Embed built from this template. Any of the title, description, footer and field values (by field index) can be substituted
+        """
+        embed = nextcord.Embed(
+            title=self.title if title is None else title,
+            description=self.description if description is None else description,
+            color=self.color
+        )
+        for index, (name, value, inline) in enumerate(self.fields):
+            if field_values and index in field_values:
+                value = field_values[index]
+            embed.add_field(name=name, value=value, inline=inline)
+        footer = self.footer if footer is None else footer
+        if footer is not None:
+            embed.set_footer(text=footer)
+        return embed
+
+
+class EmbedTemplates:
+    """
+    Class which loads and validates every embed template in a directory once, and hands out fresh Embeds built from them.
+    Templates are looked up by file name without the extension, e.g. build("about") for Embeds/about.json.
+    A background task reloads a template when its file's modification time changes, so command handlers never do disk I/O
+    """
+
+    def __init__(self, directory: str = "Embeds") -> None:
+        self.directory = directory
+        self.templates: dict[str, EmbedTemplate] = {}
+        self.mtimes: dict[str, float] = {}
+        self.task = None
+        self.reload(strict=True)
+
+    def _load(self, name: str, path: str) -> EmbedTemplate:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        EmbedTemplate.validate(data, name)
+        return EmbedTemplate(data)
+
+    def reload(self, strict: bool = False) -> list[str]:
+        """
+        Loads every template whose file is new or has changed since it was last loaded, and forgets deleted ones.
+        A template which fails to parse or validate keeps its previous version (if any) and the error is printed,
+        unless strict is set, in which case the error is raised. Returns the names of the templates that were (re)loaded
+        """
+        reloaded = []
+        seen = set()
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            name = entry.name[:-len(".json")]
+            seen.add(name)
+            mtime = entry.stat().st_mtime
+            if self.mtimes.get(name) == mtime:
+                continue
+            # Recorded even if loading fails, so a broken file is reported once rather than on every check
+            self.mtimes[name] = mtime
+            try:
+                self.templates[name] = self._load(name, entry.path)
+            except (OSError, ValueError) as error:
+                if strict:
+                    raise
+                print(f"Couldn't reload embed template {name}: {error}")
+            else:
+                reloaded.append(name)
+        for name in set(self.mtimes) - seen:
+            self.templates.pop(name, None)
+            del self.mtimes[name]
+        return reloaded
+
+    def build(self, name: str, **substitutions) -> nextcord.Embed:
+        """
+        Returns a new Embed built from the named template. See EmbedTemplate.build for the substitutions
+        Raises KeyError if there's no such template
+        """
+        return self.templates[name].build(**substitutions)
+
+    def start(self, interval: float = 10) -> None:
+        """
+        Starts the background task which checks the templates' modification times every interval seconds. Does nothing if it's already running
+        """
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._watch(interval))
+
+    async def _watch(self, interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                reloaded = await loop.run_in_executor(None, self.reload)
+            except (OSError, ValueError) as error:
+                print(f"Couldn't reload the embed templates: {error}")
+                continue
+            if reloaded:
+                print(f"Reloaded embed templates: {', '.join(reloaded)}")
+
+
+# Resolved from this file rather than the working directory, so the bot and its benchmarks can be run from anywhere
+embed_templates = EmbedTemplates(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Embeds"))
@@ -0,0 +1,218 @@
+# File which contains the append-only enrolment history of every polled section
+from __future__ import annotations
+import os
+import struct
+import threading
+import time
+from array import array
+
+
+class SectionHistory:
+    """
+    Class which holds one section's enrolment history in memory
+    Every field is delta-encoded against the previous sample and stored in a typed array
+    """
+    __slots__ = ("start", "times", "current", "maximum", "waitlist", "last")
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.times = array("I")
+        self.current = array("i")
+        self.maximum = array("i")
+        self.waitlist = array("i")
+        # Absolute (seconds since start, current, max, waitlist) of the latest sample
+        self.last = (0, 0, 0, 0)
+
+    def append_delta(self, time_delta: int, current_delta: int, maximum_delta: int, waitlist_delta: int) -> None:
+        # Samples are stored in order, so if the wall clock stepped back, the sample takes the previous sample's time
+        time_delta = max(0, time_delta)
+        self.times.append(time_delta)
+        self.current.append(current_delta)
+        self.maximum.append(maximum_delta)
+        self.waitlist.append(waitlist_delta)
+        seconds, current, maximum, waitlist = self.last
+        self.last = (seconds + time_delta, current + current_delta, maximum + maximum_delta, waitlist + waitlist_delta)
+
+    def samples(self) -> list[tuple[float, int, int, int]]:
+        """
+        Returns every sample as (timestamp, current, max, waitlist), oldest first
+        """
+        to_return = []
+        seconds = current = maximum = waitlist = 0
+        for i in range(len(self.times)):
+            seconds += self.times[i]
+            current += self.current[i]
+            maximum += self.maximum[i]
+            waitlist += self.waitlist[i]
+            to_return.append((self.start + seconds, current, maximum, waitlist))
+        return to_return
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+class EnrolmentHistory:
+    """
+    Class which stores the enrolment history of every polled section in append-only segment files.
+    A sample is only kept when a section's enrolment changed since its previous sample.
+    Samples are buffered and written once per tick as a single record, and take the tick's timestamp:
+        <d timestamp> <I new key count> <I sample count>
+        new keys, each as <H length> <utf-8 key>
+        samples, each as <I key id> <i current delta> <i max delta> <i waitlist delta>
+    Key ids are given out in order of first appearance, so the segments have to be replayed in order
+    """
+    RECORD_HEADER = struct.Struct("<dII")
+    KEY_LENGTH = struct.Struct("<H")
+    SAMPLE = struct.Struct("<Iiii")
+
+    def __init__(self, directory: str, segment_size: int = 8 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        # "<course code>|<semester>|<activity>" -> key id, and key id -> SectionHistory
+        self.key_ids = {}
+        self.sections = []
+        # Key id -> latest (current, max, waitlist) recorded, including samples which haven't been flushed yet
+        self.latest = []
+        self.pending = []
+        self.pending_keys = []
+        # Held while the in-memory history changes, since flush runs in an executor while get is called from the event loop
+        self.lock = threading.Lock()
+        # Held for a whole flush, so a flush on unload can't write the same samples as one still running in an executor
+        self.flush_lock = threading.Lock()
+        self.segment = 0
+        self._replay()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"history-{segment:06d}.seg")
+
+    def _replay(self) -> None:
+        """
+        Rebuilds the in-memory history from the segment files on disk
+        """
+        segments = sorted(int(name[8:14]) for name in os.listdir(self.directory) if name.startswith("history-") and name.endswith(".seg"))
+        for segment in segments:
+            with open(self._segment_path(segment), "rb") as file:
+                data = file.read()
+            offset = 0
+            try:
+                while offset < len(data):
+                    offset = self._replay_record(data, offset)
+            except (struct.error, UnicodeDecodeError, IndexError):
+                # A record cut short by a crash; everything before it is still good, so cut it off
+                # before anything new gets appended after it
+                print(f"Dropping truncated enrolment history record in segment {segment}")
+                with open(self._segment_path(segment), "r+b") as file:
+                    file.truncate(offset)
+            self.segment = segment
+
+    def _replay_record(self, data: bytes, offset: int) -> int:
+        timestamp, key_count, sample_count = self.RECORD_HEADER.unpack_from(data, offset)
+        offset += self.RECORD_HEADER.size
+        keys = []
+        for _ in range(key_count):
+            (length,) = self.KEY_LENGTH.unpack_from(data, offset)
+            offset += self.KEY_LENGTH.size
+            keys.append(data[offset:offset + length].decode("utf-8"))
+            if len(keys[-1].encode("utf-8")) != length:
+                raise struct.error("Truncated key")
+            offset += length
+        samples = [self.SAMPLE.unpack_from(data, offset + i * self.SAMPLE.size) for i in range(sample_count)]
+        offset += sample_count * self.SAMPLE.size
+        # Only apply the record once it has been read in full
+        for key in keys:
+            self.key_ids[key] = len(self.sections)
+            self.sections.append(SectionHistory(timestamp))
+            self.latest.append(None)
+        for key_id, current_delta, maximum_delta, waitlist_delta in samples:
+            section = self.sections[key_id]
+            section.append_delta(int(timestamp - section.start) - section.last[0], current_delta, maximum_delta, waitlist_delta)
+            self.latest[key_id] = section.last[1:]
+        return offset
+
+    def record(self, course_code: str, semester: str, activity: str, current: int, maximum: int, waitlist: int) -> bool:
+        """
+        Buffers a sample of a section's enrolment until the next flush
+        :return: True if the sample was kept, False if the enrolment hasn't changed since the previous sample.
+        """
+        key = f"{course_code}|{semester}|{activity}"
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = self.key_ids[key] = len(self.sections)
+            self.sections.append(None)
+            self.latest.append(None)
+            self.pending_keys.append(key)
+        if self.latest[key_id] == (current, maximum, waitlist):
+            return False
+        self.latest[key_id] = (current, maximum, waitlist)
+        self.pending.append(key_id)
+        return True
+
+    def flush(self, timestamp: float = None) -> int:
+        """
+        Stamps every buffered sample with timestamp (now by default) and writes them to the current segment file as one record
+        The in-memory history is only updated once the record is on disk. If the write fails, the samples stay buffered
+        and are written by the next flush, so the key ids on disk keep matching the ones in memory
+        :return: Number of samples written.
+        """
+        with self.flush_lock:
+            return self._flush(timestamp)
+
+    def _flush(self, timestamp: float = None) -> int:
+        if not self.pending:
+            return 0
+        timestamp = time.time() if timestamp is None else timestamp
+        # Samples buffered after this point are left for the next flush
+        key_count, sample_count = len(self.pending_keys), len(self.pending)
+        pending_keys = self.pending_keys[:key_count]
+        # A section appears at most once per record, with its latest enrolment
+        pending = list(dict.fromkeys(self.pending[:sample_count]))
+        parts = [self.RECORD_HEADER.pack(timestamp, len(pending_keys), len(pending))]
+        for key in pending_keys:
+            encoded = key.encode("utf-8")
+            parts.append(self.KEY_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        samples = []
+        for key_id in pending:
+            section = self.sections[key_id]
+            _, last_current, last_maximum, last_waitlist = section.last if section is not None else (0, 0, 0, 0)
+            current, maximum, waitlist = self.latest[key_id]
+            sample = (current - last_current, maximum - last_maximum, waitlist - last_waitlist)
+            samples.append((key_id, sample))
+            parts.append(self.SAMPLE.pack(key_id, *sample))
+        path = self._segment_path(self.segment)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_size:
+            self.segment += 1
+            path = self._segment_path(self.segment)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        try:
+            with open(path, "ab") as file:
+                file.write(b"".join(parts))
+        except OSError as e:
+            print(f"Couldn't write the enrolment history, keeping {len(pending)} samples for the next flush: {e}")
+            # Cut off anything half-written, so the next record doesn't land after a broken one
+            try:
+                with open(path, "r+b") as file:
+                    file.truncate(size)
+            except OSError:
+                pass
+            return 0
+        with self.lock:
+            for key in pending_keys:
+                self.sections[self.key_ids[key]] = SectionHistory(timestamp)
+            for key_id, sample in samples:
+                section = self.sections[key_id]
+                section.append_delta(int(timestamp - section.start) - section.last[0], *sample)
+        del self.pending_keys[:key_count]
+        del self.pending[:sample_count]
+        return len(pending)
+
+    def get(self, course_code: str, semester: str, activity: str) -> list[tuple[float, int, int, int]]:
+        """
+        Returns a section's history as (timestamp, current, max, waitlist) samples, oldest first
+        """
+        key_id = self.key_ids.get(f"{course_code}|{semester}|{activity}")
+        with self.lock:
+            if key_id is None or self.sections[key_id] is None:
+                return []
+            return self.sections[key_id].samples()
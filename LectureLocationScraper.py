@@ -1,12 +1,24 @@
+import asyncio
 import json
 import requests
 from intervaltree import Interval, IntervalTree
 
 from TTBAPI import TTBAPI
 from time import sleep
-api = TTBAPI()
 
-x = api._make_request("", "")
+
+async def get_catalog_courses() -> list[tuple[str, str]]:
+    """
+    Streams the whole TTB catalog and keeps only each course's code and section code,
+    so the catalog never has to be held in memory at once
+    """
+    api = TTBAPI()
+    try:
+        return [(course.course_code, course.semester) async for course in api.iter_catalog()]
+    finally:
+        await api.close()
+
+x = asyncio.run(get_catalog_courses())
 
 headers = {
     'authority': 'api.viaplanner.ca',
@@ -48,9 +60,9 @@ template = {
 
 room_availibility_tree = IntervalTree()
 total_api_requests = 0
-for course1 in x['payload']['pageableCourse']['courses']:
+for course_code, section_code in x:
     course = requests.get(
-        f'https://api.viaplanner.ca/courses/{course1["code"]}{course1["sectionCode"]}', headers=headers)
+        f'https://api.viaplanner.ca/courses/{course_code}{section_code}', headers=headers)
     total_api_requests += 1
     if total_api_requests % 20 == 0:
         sleep(60)
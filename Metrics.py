@@ -0,0 +1,195 @@
+# File which contains the bot's runtime metrics, and the local HTTP endpoint which serves them
+from __future__ import annotations
+import bisect
+from typing import Callable
+from aiohttp import web
+
+
+class Counter:
+    """
+    Class which counts events, separately for each combination of label values
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        return [(self.name, label_values, value) for label_values, value in self.values.items()]
+
+
+class Gauge:
+    """
+    Class which reports the current value of something, e.g. a queue's length, read from a function whenever the gauge is read
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.labels = ()
+        self.function = None
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Reads the value from function whenever the gauge is read
+        """
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else 0
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        return [(self.name, (), self.get())]
+
+
+class Histogram:
+    """
+    Class which counts observations into fixed buckets, separately for each combination of label values.
+    Percentiles are estimated from the buckets, so memory doesn't grow with the number of observations
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [count per bucket (the last one is +Inf), sum, count]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        state = self.values.get(label_values)
+        if state is None:
+            state = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        state = self.values.get(label_values)
+        return state[2] if state else 0
+
+    def mean(self, *label_values: str) -> float:
+        state = self.values.get(label_values)
+        return state[1] / state[2] if state else 0.0
+
+    def percentile(self, quantile: float, *label_values: str) -> float:
+        """
+        Estimates the given quantile (between 0 and 1) by interpolating within the bucket it falls in
+        Observations above the largest bucket are reported as the largest bucket's bound
+        """
+        state = self.values.get(label_values)
+        if not state:
+            return 0.0
+        rank = quantile * state[2]
+        seen = 0
+        for index, count in enumerate(state[0]):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        samples = []
+        for label_values, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", label_values + ("+Inf" if bound == float("inf") else repr(bound),), cumulative))
+            samples.append((self.name + "_sum", label_values, total))
+            samples.append((self.name + "_count", label_values, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Class which holds every metric, and renders them in the Prometheus text format
+    """
+
+    def __init__(self) -> None:
+        self.metrics = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge(name, description))
+
+    def histogram(self, name: str, description: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()) -> Histogram:
+        return self._register(Histogram(name, description, buckets, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            label_names = metric.labels + (("le",) if metric.kind == "histogram" else ())
+            for name, label_values, value in metric.samples():
+                labels = ",".join(f'{label}="{label_value}"' for label, label_value in zip(label_names, label_values))
+                lines.append(f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Class which serves a registry's metrics over HTTP at /metrics, for Prometheus or curl
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain")
+
+    async def start(self) -> None:
+        """
+        Starts serving. Does nothing if it's already running
+        """
+        if self.runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+registry = MetricsRegistry()
+ttb_requests = registry.counter("ttb_requests_total", "TTB API requests, by HTTP status (or error type)", ("status",))
+ttb_retries = registry.counter("ttb_retries_total", "TTB API requests which were retried after a transient failure")
+ttb_hedged_requests = registry.counter("ttb_hedged_requests_total", "Hedged TTB API lookups which sent a second request")
+ttb_circuit_open = registry.gauge("ttb_circuit_open", "1 while the TTB API's circuit breaker is open or half-open, 0 otherwise")
+ttb_unchanged_replies = registry.counter("ttb_unchanged_replies_total", "Course replies which were identical to the last one, so weren't parsed or evaluated again")
+ttb_course_failures = registry.counter("ttb_course_failures_total", "Courses which couldn't be polled in a refresh tick")
+ttb_request_seconds = registry.histogram("ttb_request_seconds", "TTB API request latency", LATENCY_BUCKETS)
+tick_seconds = registry.histogram("refresh_tick_seconds", "Duration of each refresh tick", LATENCY_BUCKETS)
+tick_overruns = registry.counter("refresh_tick_overruns_total", "Refresh ticks which took longer than the loop's interval")
+courses_per_tick = registry.histogram("refresh_courses_polled", "Courses polled per refresh tick", (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+sections_tracked = registry.gauge("section_states_tracked", "Sections whose last seen enrolment is kept for vacancy detection")
+courses_watched = registry.gauge("watch_index_courses", "Courses with at least one tracked activity in the in-memory watch index")
+notification_queue_depth = registry.gauge("notification_queue_depth", "Vacancy events waiting to be delivered")
+delivery_failures = registry.counter("notification_delivery_failures_total", "Notifications which couldn't be delivered, by channel (\"twilio\" for SMS and calls)", ("channel",))
+delivery_lag_seconds = registry.histogram("notification_delivery_lag_seconds", "Time from a vacancy being detected to the notification being delivered, by channel", LAG_BUCKETS, ("channel",))
@@ -1,10 +1,30 @@
 import os
+import threading
 from typing import List, Dict, Union
 import pymongo
 import dotenv
+from WatchIndex import WatchIndex
 dotenv.load_dotenv("tokens.env")
 
 class Mongo:
+    # Indexes each collection needs, by collection name: (keys, options).
+    # They are created idempotently at startup by ensure_indexes. Lookups by _id are already covered by the _id index
+    INDEXES = {
+        "courses": [
+            ([("course_code", pymongo.ASCENDING), ("semester", pymongo.ASCENDING)], {"name": "course_code_semester", "unique": True}),
+        ],
+    }
+
+    # Queries run on every tick or command, by name: (collection name, filter).
+    # explain_hot_queries checks that none of them needs a collection scan
+    HOT_QUERIES = {
+        "add/remove user to activity": ("courses", {"course_code": "CSC148H5", "semester": "F"}),
+        "is user tracking activity": ("profiles", {"_id": 0, "tracked": {"$elemMatch": {"coursecode": "CSC148H5", "semester": "F", "activity": "LEC0101"}}}),
+        "get user profile": ("profiles", {"_id": 0}),
+        "get user DLC": ("dlc", {"_id": 0}),
+        "get course sections": ("sections", {"_id": "F:CSC148H5:LEC"}),
+    }
+
     def __init__(self, creds: str, database_name: str):
         """
         Initialize MongoDBProfiles instance.
@@ -19,7 +39,51 @@ class Mongo:
         self.sections_collection = self.db['sections']
         self.faults_collection = self.db['faults']
         self.dlc_collection = self.db['dlc']
-        self.version = "MongoCore V2.1"
+        self.version = "MongoCore V2.2"
+        self.ensure_indexes()
+        self.migrate_sections_layout()
+        # In-memory copy of the courses collection which the poll loop reads instead of scanning the collection
+        self.watch_index = WatchIndex()
+        self.watch_index.load(self.courses_collection.find({}))
+
+    def ensure_indexes(self) -> None:
+        """
+        Creates every index in INDEXES which doesn't exist yet.
+        create_index is a no-op for indexes which already exist, so this is safe to run on every startup
+        """
+        for collection_name, indexes in self.INDEXES.items():
+            for keys, options in indexes:
+                try:
+                    self.db[collection_name].create_index(keys, **options)
+                except pymongo.errors.OperationFailure as e:
+                    # Most likely duplicate documents blocking a unique index; the bot still works without it
+                    print(f"Could not create index {options['name']} on {collection_name}: {e}")
+
+    def explain_hot_queries(self) -> List[Dict[str, Union[str, bool]]]:
+        """
+        Runs explain on each query in HOT_QUERIES.
+        :return: One dictionary per query with its name, collection, the stages of the winning plan,
+        and whether the plan contains a collection scan.
+        """
+        results = []
+        for name, (collection_name, query) in self.HOT_QUERIES.items():
+            plan = self.db[collection_name].find(query).explain()["queryPlanner"]["winningPlan"]
+            stages = self._plan_stages(plan)
+            results.append({"name": name, "collection": collection_name, "stages": " <- ".join(stages), "collscan": "COLLSCAN" in stages})
+        return results
+
+    def _plan_stages(self, plan: dict) -> List[str]:
+        """
+        Returns the stage names of an explain plan, from the root down
+        """
+        # Newer servers using the slot-based engine nest the classic plan under queryPlan
+        plan = plan.get("queryPlan", plan)
+        stages = [plan["stage"]] if "stage" in plan else []
+        if "inputStage" in plan:
+            stages.extend(self._plan_stages(plan["inputStage"]))
+        for input_stage in plan.get("inputStages", []):
+            stages.extend(self._plan_stages(input_stage))
+        return stages
 
     def is_user_in_db(self, user_id: str) -> bool:
         """
@@ -179,6 +243,45 @@ class Mongo:
         """
         return self.profiles_collection.find_one({"_id": user_id}).get("profile", {}) 
 
+    def get_user_profiles(self, user_ids: List[str]) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """
+        Get the profiles of many users with a single query.
+
+        :param user_ids: List of Discord IDs.
+        :return: Dictionary mapping each user ID to their profile. Users without a profile are left out.
+        """
+        return {doc["_id"]: doc.get("profile", {}) for doc in self.profiles_collection.find({"_id": {"$in": list(user_ids)}}, {"profile": 1})}
+
+    def get_user_dlcs(self, user_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Get the DLC profiles of many users with a single query.
+
+        :param user_ids: List of Discord IDs.
+        :return: Dictionary mapping each user ID to their DLC profile. Users without one are left out.
+        """
+        return {doc["_id"]: doc for doc in self.dlc_collection.find({"_id": {"$in": list(user_ids)}})}
+
+    def remove_tracked_activity_for_users(self, user_ids: List[str], course_code: str, semester: str, activity: str) -> None:
+        """
+        Remove a tracked activity from many users' profiles at once.
+        Sends one bulk_write to the profiles collection and one to the courses collection,
+        instead of two updates per user.
+        :param user_ids: List of Discord IDs.
+        :param course_code: Course code of the tracked activity.
+        :param semester: Semester of the tracked activity.
+        :param activity: Activity type of the tracked activity.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        tracked = {"coursecode": course_code, "semester": semester, "activity": activity}
+        self.profiles_collection.bulk_write(
+            [pymongo.UpdateOne({"_id": user_id}, {"$pull": {"tracked": tracked}}) for user_id in user_ids], ordered=False)
+        self.courses_collection.bulk_write(
+            [pymongo.UpdateOne({"course_code": course_code, "semester": semester}, {"$pull": {f"activities.{activity}": {"$in": user_ids}}})])
+        for user_id in user_ids:
+            self.watch_index.remove(user_id, course_code, semester, activity)
+
     def _add_user_to_activity(self, user_id: str, course_code: str, semester: str, activity: str) -> bool:
         """
         Add a user to an activity.
@@ -203,6 +306,7 @@ class Mongo:
             }
         }
         self.courses_collection.update_one(query, update, upsert=True)
+        self.watch_index.add(user_id, course_code, semester, activity)
 
     def _remove_user_from_activity(self, user_id: str, course_code: str, semester: str, activity: str) -> bool:
         """
@@ -224,19 +328,19 @@ class Mongo:
             }
         }
         self.courses_collection.update_one(query, update)
+        self.watch_index.remove(user_id, course_code, semester, activity)
 
     def add_course_sections(self, course_code: str, semester: str, activity_type: str, sections: list[str]):
         """
         Add a list of sections for a course to the database.
+        Each (semester, course, activity type) has its own small document, see _sections_id
         """
-        update_query = {
-            f"{course_code}.{activity_type}": {"$each": sections}
-        }
-
-        # Update the document in the database
         self.sections_collection.update_one(
-            {"_id": semester},
-            {"$addToSet": update_query},
+            {"_id": self._sections_id(course_code, semester, activity_type)},
+            {
+                "$set": {"semester": semester, "course_code": course_code, "activity_type": activity_type},
+                "$addToSet": {"sections": {"$each": sections}}
+            },
             upsert=True
         )
 
@@ -244,19 +348,51 @@ class Mongo:
         """
         Get a list of sections for a course.
         """
-        doc = self.sections_collection.find_one({"_id": semester})
-        return doc.get(course_code, {}).get(activity_type, [])
+        doc = self.sections_collection.find_one({"_id": self._sections_id(course_code, semester, activity_type)}, {"sections": 1})
+        if doc is None:
+            return []
+        return doc.get("sections", [])
 
     def is_course_sections_in_database(self, course_code: str, semester: str, activity_type: str) -> bool:
         """
         Return whether a course's sections are in the database.
         """
-        doc = self.sections_collection.find_one({"_id": semester})
-        if doc:
-            course_activity_data = doc.get(course_code, {})
-            return bool(course_activity_data.get(activity_type, []))
-        else:
-            return False
+        return bool(self.get_course_sections(course_code, semester, activity_type))
+
+    def _sections_id(self, course_code: str, semester: str, activity_type: str) -> str:
+        """
+        Returns the _id of the sections document for a (semester, course, activity type),
+        so every lookup is a point read on the _id index
+        """
+        return f"{semester}:{course_code}:{activity_type}"
+
+    def migrate_sections_layout(self) -> int:
+        """
+        Splits the old one-document-per-semester sections layout ({"_id": semester, course_code: {activity_type: [...]}})
+        into one document per (semester, course, activity type).
+        Safe to run more than once: it only touches the old semester documents, and deletes each one once it has been split.
+        :return: Number of per-course documents written.
+        """
+        written = 0
+        for legacy_doc in self.sections_collection.find({"_id": {"$in": ["F", "S", "Y"]}}):
+            semester = legacy_doc.pop("_id")
+            operations = [
+                pymongo.UpdateOne(
+                    {"_id": self._sections_id(course_code, semester, activity_type)},
+                    {
+                        "$set": {"semester": semester, "course_code": course_code, "activity_type": activity_type},
+                        "$addToSet": {"sections": {"$each": sections}}
+                    },
+                    upsert=True
+                )
+                for course_code, activities in legacy_doc.items()
+                for activity_type, sections in activities.items()
+            ]
+            if operations:
+                self.sections_collection.bulk_write(operations, ordered=False)
+                written += len(operations)
+            self.sections_collection.delete_one({"_id": semester})
+        return written
 
     def add_blank_dlc(self, user_id) -> None:
         """
@@ -288,7 +424,35 @@ class Mongo:
         update_query = {"$set": {key: value for key, value in new_dlc.items()}}
         self.dlc_collection.update_one({"_id": user_id}, update_query, upsert=True)
 
-    
+    def start_change_feed(self) -> None:
+        """
+        Starts a background thread which keeps the watch index in sync with writes made by other processes
+        """
+        threading.Thread(target=self._follow_change_feed, name="mongo-change-feed", daemon=True).start()
+
+    def _follow_change_feed(self) -> None:
+        """
+        Applies every change to the courses collection to the watch index
+        Change streams need a replica set; on a standalone server this logs a message and gives up,
+        and the index is only updated by this process' own writes
+        """
+        try:
+            with self.courses_collection.watch(full_document="updateLookup") as stream:
+                for change in stream:
+                    if change["operationType"] == "delete":
+                        self.watch_index.remove_document(change["documentKey"]["_id"])
+                    elif change.get("fullDocument"):
+                        self.watch_index.replace_course(change["fullDocument"])
+        except pymongo.errors.PyMongoError as e:
+            print(f"Course change feed stopped: {e}")
+
+    def close(self) -> None:
+        """
+        Closes the connection to the database
+        """
+        self.client.close()
+
+
 if __name__ == "__main__":
     # Crude tests for each of the methods
     database_creds = os.getenv("PYMONGO")
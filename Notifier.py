@@ -0,0 +1,139 @@
+# File which contains the pipeline that delivers vacancy notifications to users
+from __future__ import annotations
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from nextcord.ext import commands
+from AsyncMongo import AsyncMongo
+from UserContact import UserContact
+import Metrics
+
+
+class VacancyEvent:
+    """
+    Class which represents one message to deliver to a group of users, and the tracked activity to remove for them afterwards
+    """
+    __slots__ = ("users", "course_code", "semester", "activity", "message", "detected_at")
+
+    def __init__(self, users: list[int], course_code: str, semester: str, activity: str, message: str) -> None:
+        self.users = users
+        self.course_code = course_code
+        self.semester = semester
+        self.activity = activity
+        self.message = message
+        self.detected_at = time.monotonic()
+
+    def keys(self) -> list[tuple[int, str, str, str]]:
+        return [(user, self.course_code, self.semester, self.activity) for user in self.users]
+
+
+class NotificationDispatcher:
+    """
+    Class which delivers notifications off the poll loop.
+    The poll loop only enqueues vacancy events; a pool of `workers` asyncio tasks drains the queue.
+    For each event, every subscriber's profile and DLC are loaded with one query per collection,
+    Discord messages are sent concurrently (at most `workers` at a time), and the activity is untracked
+    for every user who was notified with one bulk write per collection. Twilio's client is blocking, so SMS and calls
+    run on a separate thread pool of `twilio_threads` threads
+    """
+
+    def __init__(self, bot: commands.Bot, database: AsyncMongo, contact: UserContact, workers: int = 8, twilio_threads: int = 4) -> None:
+        self.bot = bot
+        self.database = database
+        self.contact = contact
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        Metrics.notification_queue_depth.set_function(self.queue.qsize)
+        self.delivery_slots = asyncio.Semaphore(workers)
+        self.twilio_executor = ThreadPoolExecutor(max_workers=twilio_threads, thread_name_prefix="twilio")
+        self.tasks = []
+        # Notifications which are queued or being delivered. Users stay subscribed until their notification is
+        # delivered, so this stops the next tick from queueing the same notification again
+        self.pending = set()
+
+    def start(self) -> None:
+        """
+        Starts the worker tasks. Does nothing if they are already running
+        """
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stops the worker tasks. Events still in the queue are dropped
+        """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.twilio_executor.shutdown(wait=False)
+
+    def enqueue(self, users: list[int], course_code: str, semester: str, activity: str, message: str) -> int:
+        """
+        Queues a vacancy event for every user in users, skipping ones whose notification is already pending
+        :return: Number of users queued.
+        """
+        users = [user for user in users if (user, course_code, semester, activity) not in self.pending]
+        if not users:
+            return 0
+        event = VacancyEvent(users, course_code, semester, activity, message)
+        self.pending.update(event.keys())
+        self.queue.put_nowait(event)
+        return len(users)
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self.queue.get()
+            try:
+                await self._handle(event)
+            except Exception as e:
+                # One failed event shouldn't take the worker down with it
+                print(f"Failed to handle vacancy event for {event.course_code} {event.activity}: {e}")
+            finally:
+                self.pending.difference_update(event.keys())
+                self.queue.task_done()
+
+    async def _handle(self, event: VacancyEvent) -> None:
+        """
+        Notifies every user of an event, then stops tracking the activity for the users who were notified.
+        Users who couldn't be notified stay subscribed, so they're notified the next time the activity opens
+        """
+        profiles = await self.database.get_user_profiles(event.users)
+        dlcs = await self.database.get_user_dlcs(event.users)
+        delivered = await asyncio.gather(*(self._deliver(user, event.message, profiles.get(user, {}), dlcs.get(user), event.detected_at) for user in event.users))
+        notified = [user for user, success in zip(event.users, delivered) if success]
+        if notified:
+            # Remove the users from the database
+            await self.database.remove_tracked_activity_for_users(notified, event.course_code, event.semester, event.activity)
+
+    async def _deliver(self, user_id: int, message: str, profile: dict, dlc: dict, detected_at: float) -> bool:
+        """
+        Contacts a user via Discord and their profile's other contact methods, and records how long after
+        the vacancy was detected each channel delivered
+        A failure is logged and only affects this user
+        :return: True if the user was notified on Discord, False if that failed.
+        """
+        # The delivery slot only covers the Discord send; the Twilio step is limited by its own thread pool,
+        # so slow SMS and calls don't hold up Discord messages queued behind them
+        async with self.delivery_slots:
+            try:
+                # Step 1: contact via discord
+                discord_user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                await discord_user.send(message)
+                Metrics.delivery_lag_seconds.observe(time.monotonic() - detected_at, "discord")
+            except Exception as e:
+                print(f"Failed to notify {user_id}: {e}")
+                Metrics.delivery_failures.inc("discord")
+                return False
+        if dlc is None:
+            return True
+        try:
+            # Step 2: contact via SMS/phone call on the Twilio thread pool
+            channels = await asyncio.get_running_loop().run_in_executor(self.twilio_executor, self.contact.contact_user, profile, message, dlc)
+            for channel in channels or ():
+                Metrics.delivery_lag_seconds.observe(time.monotonic() - detected_at, channel)
+        except Exception as e:
+            # The Discord message got through, so the user counts as notified either way
+            print(f"Failed to notify {user_id} by SMS or call: {e}")
+            Metrics.delivery_failures.inc("twilio")
+        return True
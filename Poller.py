@@ -0,0 +1,84 @@
+# File which contains the engine used to poll many courses from the TTB API at once
+from __future__ import annotations
+import asyncio
+from TTBAPI import TTBAPI
+from Courses import Course
+import Metrics
+
+
+class CoursePoller:
+    """
+    Class which fetches many courses from the TTB API concurrently
+    At most `concurrency` requests are in flight at once, and every request also goes through
+    the TTB API's token bucket, so a tick takes roughly as long as its slowest request
+    instead of the sum of all of them.
+    Polls skip the course cache, so a course can be polled more often than the cache's TTL
+    A course which can't be fetched is left out of the results, so it doesn't cost the rest of the tick
+    """
+
+    def __init__(self, ttbapi: TTBAPI, concurrency: int = 8) -> None:
+        self.ttbapi = ttbapi
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _fetch(self, course_code: str, semester: str, hedge: bool) -> Course:
+        async with self.semaphore:
+            return await self.ttbapi.poll_course(course_code, semester, hedge)
+
+    async def poll(self, keys: list[tuple[str, str]], hot: set[tuple[str, str]] = frozenset()) -> dict[tuple[str, str], Course]:
+        """
+        Fetches every (course code, semester) pair in keys. Lookups of the pairs in hot are hedged
+        Returns a dictionary mapping each pair which could be fetched to its Course object
+        """
+        keys = list(dict.fromkeys(keys))
+        results = await asyncio.gather(*(self._fetch(course_code, semester, (course_code, semester) in hot) for course_code, semester in keys), return_exceptions=True)
+        courses = {}
+        failures = []
+        for key, result in zip(keys, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                failures.append((key, result))
+            else:
+                courses[key] = result
+        if failures:
+            Metrics.ttb_course_failures.inc(amount=len(failures))
+            (course_code, semester), error = failures[0]
+            print(f"Couldn't poll {len(failures)} of {len(keys)} courses, e.g. {course_code} {semester}: {type(error).__name__}: {error}")
+        return courses
+
+    async def _fetch_group(self, prefix: str) -> dict[tuple[str, str], Course]:
+        async with self.semaphore:
+            return await self.ttbapi.get_course_group(prefix)
+
+    async def poll_grouped(self, keys: list[tuple[str, str]], prefix_length: int = 3) -> dict[tuple[str, str], Course]:
+        """
+        Fetches every (course code, semester) pair in keys, with one request per group of courses
+        which share the first prefix_length characters of their code (e.g. the department, "CSC")
+        Returns a dictionary mapping each pair which could be fetched to its Course object
+        """
+        groups = {}
+        for key in dict.fromkeys(keys):
+            groups.setdefault(key[0][:prefix_length], []).append(key)
+        results = await asyncio.gather(*(self._fetch_group(prefix) for prefix in groups), return_exceptions=True)
+        courses = {}
+        failures = []
+        missing = 0
+        for (prefix, group_keys), result in zip(groups.items(), results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                failures.append((prefix, len(group_keys), result))
+                continue
+            for key in group_keys:
+                if key in result:
+                    courses[key] = result[key]
+                else:
+                    missing += 1
+        if failures:
+            Metrics.ttb_course_failures.inc(amount=sum(count for _, count, _ in failures))
+            prefix, _, error = failures[0]
+            print(f"Couldn't poll {len(failures)} of {len(groups)} course groups, e.g. {prefix}: {type(error).__name__}: {error}")
+        if missing:
+            print(f"{missing} tracked courses weren't in their group's reply")
+        return courses
@@ -3,8 +3,9 @@ from typing import Optional
 import nextcord
 from nextcord import SlashOption
 from nextcord.ext import commands
-from Mongo import Mongo
-from CommonUtils import validate_phone_number, build_embed_from_json, sanitize_phone_number
+from AsyncMongo import AsyncMongo
+from CommonUtils import validate_phone_number, sanitize_phone_number
+from EmbedTemplates import embed_templates
 from Views import ConfirmDialogue
 from random import randint
 from UserContact import UserContact
@@ -12,12 +13,17 @@ from Views import NotificationsView
 import random
 
 class ProfilesCog(commands.Cog, name="Profiles"):
-    def __init__(self, bot: commands.Bot, database: Mongo, contact: UserContact) -> None:
+    def __init__(self, bot: commands.Bot, database: AsyncMongo, contact: UserContact) -> None:
         super().__init__()
         self.bot = bot
         self.db = database
         self.contact = contact
-        self.version = "ProfileCore V3.2\nDLCore V1.0\n" + self.db.version + "\n" + self.contact.version 
+
+    @property
+    def version(self) -> str:
+        # Built on demand, since the database's version isn't known until it has connected.
+        # Reading it blocks until then, so await database.wait_until_connected() first when on the event loop
+        return "ProfileCore V3.2\nDLCore V1.0\n" + self.db.version + "\n" + self.contact.version
         
     @nextcord.slash_command(name="profile")
     async def profile(self, iteraction: nextcord.Interaction) -> None:
@@ -34,10 +40,10 @@ class ProfilesCog(commands.Cog, name="Profiles"):
             "phone_number": {"number": "", "SMS": True, "call": False, "confirmed": False, "code": "", "failed_attempts": 0},
         }
         
-        if self.db.is_user_in_db(user_id) and self.db.get_user_profile(user_id):
-            profile = self.db.get_user_profile(user_id)
+        if await self.db.is_user_in_db(user_id) and await self.db.get_user_profile(user_id):
+            profile = await self.db.get_user_profile(user_id)
         else:
-            faults = self.db.get_user_faults(user_id)
+            faults = await self.db.get_user_faults(user_id)
             profile['phone_number'].update(faults)
             
     
@@ -53,23 +59,23 @@ class ProfilesCog(commands.Cog, name="Profiles"):
         profile['phone_number']['code'] = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         self.contact.confirm_user_number(profile["phone_number"]["number"], profile['phone_number']['code'])
             
-        if not self.db.is_user_in_db(user_id):
-            self.db.add_user_to_db(user_id, profile)
-            self.db.add_blank_dlc(user_id)
+        if not await self.db.is_user_in_db(user_id):
+            await self.db.add_user_to_db(user_id, profile)
+            await self.db.add_blank_dlc(user_id)
             vcf_file = nextcord.File("ttbtrackr.vcf")
             await interaction.response.send_message("Successfully setup your profile! Remember to follow [@ttbtrackr](https://www.instagram.com/ttbtrackr/) on Instagram and add (850)-660-0835 to get notified when we send a message! \n*Tip: You can easily add TTBTrackr to your phone's contacts by downloading and opening this vcard file!*", ephemeral=True, file=vcf_file)
         else:
-            self.db.update_user_profile(user_id, profile)
+            await self.db.update_user_profile(user_id, profile)
             await interaction.response.send_message("Your profile has been updated!", ephemeral=True)
         
     @profile.subcommand(name="view", description="View your profile")
     async def view_profile(self, interaction: nextcord.Interaction):
         user_id = interaction.user.id
-        if not self.db.is_user_in_db(user_id):
+        if not await self.db.is_user_in_db(user_id):
             await interaction.response.send_message("You don't have a profile to view!", ephemeral=True)
             return
-        profile = self.db.get_user_profile(user_id)
-        dlc = self.db.get_user_dlc(user_id)
+        profile = await self.db.get_user_profile(user_id)
+        dlc = await self.db.get_user_dlc(user_id)
         embed = nextcord.Embed(title="Your TTBTrackr Profile", description="Here is your profile information", color=nextcord.Color.blue())
         
         function_map = {"phone_number": self._add_phone_to_profile}
@@ -105,26 +111,26 @@ class ProfilesCog(commands.Cog, name="Profiles"):
     @profile.subcommand(name="delete", description="Delete your profile")
     async def delete_profile(self, interaction: nextcord.Interaction) -> None:
         # First, check if the user has a profile
-        if not self.db.is_user_in_db(interaction.user.id):
+        if not await self.db.is_user_in_db(interaction.user.id):
             await interaction.response.send_message("You don't have a profile to delete!", ephemeral=True)
             return
         # For obvious reasons, we need to ask the user if they're sure
         confirm = ConfirmDialogue()
-        await interaction.response.send_message(embed=build_embed_from_json("Embeds/delete_profile_warning.json"), ephemeral=True, view=confirm)
+        await interaction.response.send_message(embed=embed_templates.build("delete_profile_warning"), ephemeral=True, view=confirm)
         await confirm.wait()
         if confirm.value:
-            self.db.remove_user(interaction.user.id)
+            await self.db.remove_user(interaction.user.id)
             await interaction.followup.send("Your profile has been deleted. We're sad to see you go 😢", ephemeral=True)
         else:
             await interaction.followup.send("Canceled", ephemeral=True)
 
     @profile.subcommand(name="confirm", description="Verify your phone number to activate phone-related functions")
     async def verify(self, interaction: nextcord.Interaction, code: str):
-        if not self.db.is_user_in_db(interaction.user.id):
+        if not await self.db.is_user_in_db(interaction.user.id):
             await interaction.response.send_message("You don't have a profile setup. Use `/profile edit` to setup your profile!", ephemeral=True)
             return
         
-        user_profile = self.db.get_user_profile(interaction.user.id)
+        user_profile = await self.db.get_user_profile(interaction.user.id)
         if user_profile['phone_number']['confirmed']:
             await interaction.response.send_message("You already confirmed your number", ephemeral=True)
             return
@@ -132,7 +138,7 @@ class ProfilesCog(commands.Cog, name="Profiles"):
         if code == user_profile['phone_number']['code']:
             await interaction.response.send_message("Phone number successfully confirmed!", ephemeral=True)
             user_profile['phone_number']['confirmed'] = True
-            self.db.update_user_profile(interaction.user.id, user_profile)
+            await self.db.update_user_profile(interaction.user.id, user_profile)
             return
 
         failed_attempts = user_profile['phone_number'].get("failed_attempts", 0) + 1
@@ -143,24 +149,24 @@ class ProfilesCog(commands.Cog, name="Profiles"):
         if failed_attempts % 3 == 0:
             code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
             user_profile['phone_number']['code'] = code
-            self.db.update_user_profile(interaction.user.id, user_profile)
-            self.db.update_user_faults(interaction.user.id, {"failed_attempts": failed_attempts})
+            await self.db.update_user_profile(interaction.user.id, user_profile)
+            await self.db.update_user_faults(interaction.user.id, {"failed_attempts": failed_attempts})
             self.contact.confirm_user_number(user_profile["phone_number"]["number"], code)
             await interaction.response.send_message("Verification failed. A new verification code has been sent.", ephemeral=True)        
             return
 
         await interaction.response.send_message("Invalid code, please try again", ephemeral=True)
-        self.db.update_user_profile(interaction.user.id, user_profile)
-        self.db.update_user_faults(interaction.user.id, {"failed_attempts": failed_attempts})
+        await self.db.update_user_profile(interaction.user.id, user_profile)
+        await self.db.update_user_faults(interaction.user.id, {"failed_attempts": failed_attempts})
 
     
     @profile.subcommand(name="resend", description="Resend your verification code, if you didn't recieve it")
     async def resend(self, interaction: nextcord.Interaction):
-        if not self.db.is_user_in_db(interaction.user.id):
+        if not await self.db.is_user_in_db(interaction.user.id):
             await interaction.response.send_message("You don't have a profile setup. Use `/profile edit` to setup your profile!", ephemeral=True)
             return
         
-        user_profile = self.db.get_user_profile(interaction.user.id)
+        user_profile = await self.db.get_user_profile(interaction.user.id)
         if user_profile['phone_number']['confirmed']:
             await interaction.response.send_message("You already confirmed your number", ephemeral=True)
             return
@@ -174,7 +180,7 @@ class ProfilesCog(commands.Cog, name="Profiles"):
         code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         
         user_profile['phone_number']['code'] = code
-        self.db.update_user_profile(interaction.user.id, user_profile)
+        await self.db.update_user_profile(interaction.user.id, user_profile)
         self.contact.confirm_user_number(user_profile["phone_number"]["number"], code)
-        self.db.update_user_faults(interaction.user.id, {"failed_attempts": resent_codes})
+        await self.db.update_user_faults(interaction.user.id, {"failed_attempts": resent_codes})
         await interaction.response.send_message("Verification code resent!", ephemeral=True)
\ No newline at end of file
@@ -0,0 +1,172 @@
+# File which contains the on-demand CPU and memory profilers used by the admin commands
+from __future__ import annotations
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+
+class ProfilerBusyError(Exception):
+    """
+    Exception which is raised when a profile is requested while another one is still running
+    """
+    pass
+
+
+class CodeProfiler:
+    """
+    Class which runs cProfile on a live bot, either for the next few refresh ticks or for a window of time.
+    Only one profile can run at a time, since Python allows only one profiler per thread.
+    cProfile sees everything that runs on the event loop's thread while it's enabled, so a tick's profile
+    also includes any slash commands and notification deliveries which ran during that tick
+    """
+
+    def __init__(self) -> None:
+        self.profile = None
+        self.ticks_left = 0
+        self.ticks_profiled = 0
+        self.result = None
+
+    @property
+    def busy(self) -> bool:
+        return self.profile is not None
+
+    def _begin(self) -> cProfile.Profile:
+        if self.busy:
+            raise ProfilerBusyError("A profile is already running")
+        self.profile = cProfile.Profile()
+        return self.profile
+
+    def profile_ticks(self, ticks: int) -> asyncio.Future:
+        """
+        Profiles the next `ticks` refresh ticks
+        Returns a future which resolves to the report once they have run
+        """
+        self._begin()
+        self.ticks_left = ticks
+        self.ticks_profiled = 0
+        self.result = asyncio.get_running_loop().create_future()
+        return self.result
+
+    def tick_started(self) -> None:
+        """
+        Called by the refresh loop at the start of every tick
+        """
+        if self.ticks_left:
+            self.profile.enable()
+
+    def tick_finished(self) -> None:
+        """
+        Called by the refresh loop at the end of every tick, even if the tick failed
+        """
+        if not self.ticks_left:
+            return
+        self.profile.disable()
+        self.ticks_left -= 1
+        self.ticks_profiled += 1
+        if not self.ticks_left:
+            profile, self.profile = self.profile, None
+            if not self.result.done():
+                self.result.set_result(self.report(profile, f"{self.ticks_profiled} refresh ticks"))
+
+    def cancel(self) -> None:
+        """
+        Abandons a tick profile which hasn't finished yet
+        """
+        if self.ticks_left:
+            self.ticks_left = 0
+            self.profile = None
+            if not self.result.done():
+                self.result.cancel()
+
+    async def profile_window(self, seconds: float) -> str:
+        """
+        Profiles everything the event loop's thread runs for the given number of seconds, and returns the report
+        """
+        profile = self._begin()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+            self.profile = None
+        return self.report(profile, f"a {seconds:g} second window")
+
+    @staticmethod
+    def report(profile: cProfile.Profile, title: str, limit: int = 40) -> str:
+        """
+        Returns the top functions of a profile by cumulative time, then by own time, as text
+        """
+        stream = io.StringIO()
+        stream.write(f"cProfile of {title}, taken {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        stats = pstats.Stats(profile, stream=stream)
+        stats.strip_dirs()
+        stream.write(f"=== Top {limit} functions by cumulative time ===\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        stream.write(f"=== Top {limit} functions by own time ===\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(limit)
+        return stream.getvalue()
+
+
+class MemoryProfiler:
+    """
+    Class which takes tracemalloc snapshots and diffs each one against the previous one.
+    Tracing starts with the first snapshot and slows allocations down until stop is called
+    """
+    # Allocations made by tracemalloc itself and by imports aren't interesting
+    FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self, frames: int = 10) -> None:
+        self.frames = frames
+        self.baseline = None
+        self.baseline_taken = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def snapshot(self, limit: int = 30) -> str:
+        """
+        Takes a snapshot (starting tracing if needed), keeps it as the baseline for the next diff,
+        and returns the top allocation sites as text
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.baseline = None
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"tracemalloc snapshot, taken {time.strftime('%Y-%m-%d %H:%M:%S')}",
+                 f"Traced memory: {current / 1024 / 1024:.1f} MiB now, {peak / 1024 / 1024:.1f} MiB peak", "",
+                 f"=== Top {limit} allocation sites ==="]
+        lines.extend(str(statistic) for statistic in snapshot.statistics("lineno")[:limit])
+        if self.baseline is not None:
+            lines.extend(["", f"=== Top {limit} changes since the snapshot taken {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.baseline_taken))} ==="])
+            lines.extend(str(statistic) for statistic in snapshot.compare_to(self.baseline, "lineno")[:limit])
+            # The largest growth, with its whole traceback, is usually the leak
+            growth = snapshot.compare_to(self.baseline, "traceback")
+            if growth and growth[0].size_diff > 0:
+                lines.extend(["", "=== Traceback of the largest growth ==="])
+                lines.extend(growth[0].traceback.format())
+        else:
+            lines.extend(["", "No earlier snapshot to diff against. Take another snapshot later to see what changed."])
+        self.baseline = snapshot
+        self.baseline_taken = time.time()
+        return "\n".join(lines) + "\n"
+
+    def stop(self) -> None:
+        """
+        Stops tracing and forgets the baseline
+        """
+        tracemalloc.stop()
+        self.baseline = None
+
+
+profiler = CodeProfiler()
+memory_profiler = MemoryProfiler()
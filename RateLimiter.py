@@ -0,0 +1,38 @@
+# File which contains the rate limiter shared by every request to the TTB API
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Class which implements an asyncio token bucket
+    Tokens are refilled continuously at `rate` per second, up to `capacity`.
+    Every request takes one token, waiting for a refill if the bucket is empty
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """
+        Waits until a token is availible, then takes it
+        """
+        if self.rate <= 0:
+            # A non-positive rate disables rate limiting
+            return
+        # The lock makes waiters queue up in order instead of all waking up on the same refill
+        async with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
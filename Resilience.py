@@ -0,0 +1,79 @@
+# File which contains the retry and circuit-breaker helpers used by the TTB API client
+import random
+import time
+
+
+class Backoff:
+    """
+    Class which computes jittered exponential backoff delays ("full jitter"):
+    before retry n, wait a random time between 0 and min(cap, base * 2^n) seconds,
+    so many clients which failed at once don't all retry at once
+    """
+
+    def __init__(self, base: float = 0.5, cap: float = 8) -> None:
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Class which stops requests to a host that keeps failing, instead of queueing more work for it.
+    After `failure_threshold` failures in a row the circuit opens and requests are refused for `reset_timeout` seconds.
+    Then it goes half-open: one trial request is let through, and its result closes the circuit or opens it again
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allow(self) -> bool:
+        """
+        Returns whether a request may be made now. In the half-open state only one trial request is allowed at a time
+        """
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            # A non-positive threshold disables the breaker
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self.trial_in_flight:
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def release(self) -> None:
+        """
+        Lets another trial request through if the current one ended without a result, e.g. because it was cancelled
+        """
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and 0 < self.failure_threshold <= self.failures):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """
+        Returns how many seconds are left until an open circuit lets a trial request through
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
@@ -0,0 +1,145 @@
+# File which contains the scheduler deciding which courses to poll on each tick
+from __future__ import annotations
+import json
+import math
+import random
+import time
+from datetime import date
+
+
+class EnrolmentCalendar:
+    """
+    Class which represents the enrolment windows (e.g. add/drop) during which courses are polled more often
+    Each window has a start date, an end date (both inclusive) and a boost: how many times faster courses are polled
+    """
+
+    def __init__(self, windows: list[dict]) -> None:
+        self.windows = [(date.fromisoformat(window["start"]), date.fromisoformat(window["end"]), float(window.get("boost", 1))) for window in windows]
+
+    @classmethod
+    def load(cls, path: str) -> EnrolmentCalendar:
+        """
+        Loads the calendar from a JSON file, or returns an empty calendar if there is no usable file
+        """
+        try:
+            with open(path, "r") as file:
+                return cls(json.load(file)["windows"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No enrolment windows loaded: {e}")
+            return cls([])
+
+    def boost(self, today: date = None) -> float:
+        """
+        Returns the largest boost of the windows which contain today, or 1 outside of every window
+        """
+        today = today or date.today()
+        return max([boost for start, end, boost in self.windows if start <= today <= end], default=1.0)
+
+
+class CourseSchedule:
+    """
+    Class which holds the polling state of a single course
+    """
+    __slots__ = ("interval", "next_due", "churn")
+
+    def __init__(self, interval: float, next_due: float) -> None:
+        self.interval = interval
+        self.next_due = next_due
+        # Moving average of how often a poll finds the course's enrolment changed, between 0 and 1
+        self.churn = 0.0
+
+
+class AdaptivePollScheduler:
+    """
+    Class which gives each course its own polling interval instead of polling every course on every tick.
+    A course is polled more often the more users track it, the more often its enrolment changes,
+    and during enrolment windows; quiet courses back off towards max_interval.
+    The number of courses polled is capped by a global budget of requests per minute
+    """
+    # Weight of the latest poll in the churn moving average
+    CHURN_SMOOTHING = 0.3
+
+    def __init__(self, calendar: EnrolmentCalendar, base_interval: float = 30, min_interval: float = 3, max_interval: float = 600, budget_per_minute: float = 300) -> None:
+        self.calendar = calendar
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget_per_minute = budget_per_minute
+        self.budget = budget_per_minute / 4
+        self.budget_updated = time.monotonic()
+        self.schedules = {}
+
+    def _refill_budget(self, now: float) -> None:
+        self.budget = min(self.budget_per_minute / 4, self.budget + (now - self.budget_updated) * self.budget_per_minute / 60)
+        self.budget_updated = now
+
+    def interval_for(self, subscribers: int, churn: float, boost: float) -> float:
+        """
+        Returns the polling interval of a course with the given number of subscribers, churn and calendar boost
+        """
+        demand = 1 + math.log2(1 + subscribers)
+        # A course which never changes is polled 4x less often than base, one which changes on every poll 5x more often
+        volatility = 0.25 + 4.75 * churn
+        interval = self.base_interval / (demand * volatility * boost)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def stagger(self, keys) -> None:
+        """
+        Schedules the first poll of each course in keys at a random point within the next base interval,
+        instead of straight away
+        """
+        now = time.monotonic()
+        for key in keys:
+            self.schedules[key] = CourseSchedule(self.base_interval, now + random.uniform(0, self.base_interval))
+
+    def due(self, courses: list[dict]) -> list[tuple[str, str]]:
+        """
+        Returns the (course code, semester) of every course in courses which should be polled now,
+        most overdue first, and no more than the request budget allows.
+        courses is in the same shape as WatchIndex.snapshot
+        """
+        now = time.monotonic()
+        self._refill_budget(now)
+        tracked = set()
+        overdue = []
+        for course in courses:
+            key = (course["course_code"], course["semester"])
+            tracked.add(key)
+            schedule = self.schedules.get(key)
+            if schedule is None:
+                # Courses we've never polled are due straight away
+                schedule = self.schedules[key] = CourseSchedule(self.base_interval, now)
+            if schedule.next_due <= now:
+                overdue.append(((now - schedule.next_due) / schedule.interval, key))
+        # Forget courses nobody tracks anymore
+        for key in self.schedules.keys() - tracked:
+            del self.schedules[key]
+        overdue.sort(reverse=True)
+        allowed = min(len(overdue), int(self.budget))
+        self.budget -= allowed
+        return [key for _, key in overdue[:allowed]]
+
+    def record(self, key: tuple[str, str], subscribers: int, changed: bool) -> None:
+        """
+        Records that a course was just polled, and schedules its next poll
+        """
+        schedule = self.schedules.get(key)
+        if schedule is None:
+            return
+        schedule.churn += self.CHURN_SMOOTHING * (changed - schedule.churn)
+        schedule.interval = self.interval_for(subscribers, schedule.churn, self.calendar.boost())
+        schedule.next_due = time.monotonic() + schedule.interval
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns a summary of the scheduler's state
+        """
+        intervals = sorted(schedule.interval for schedule in self.schedules.values())
+        return {
+            "courses": len(intervals),
+            "min_interval": intervals[0] if intervals else 0,
+            "median_interval": intervals[len(intervals) // 2] if intervals else 0,
+            "max_interval": intervals[-1] if intervals else 0,
+            "budget_per_minute": self.budget_per_minute,
+            "boost": self.calendar.boost(),
+        }
@@ -0,0 +1,112 @@
+# File which contains the store of each section's last seen enrolment
+from __future__ import annotations
+import struct
+from array import array
+from Courses import Course
+
+
+class SectionStateStore:
+    """
+    Class which remembers the last seen enrolment of every section, so vacancies can be edge-triggered:
+    a section only counts as newly opened on a closed -> open transition.
+    Sections are numbered by slot, and each field is one typed array indexed by slot instead of a dict per section,
+    which keeps every section in the catalog within a few MB
+    """
+    MAGIC = b"TTBS"
+    VERSION = 1
+
+    def __init__(self) -> None:
+        # "<course code>|<semester>|<activity>" -> slot
+        self.slots = {}
+        self.current = array("i")
+        self.maximum = array("i")
+        self.waitlist = array("i")
+        self.open_limit = array("b")
+        # Number of section updates which found a new or changed section
+        self.changes = 0
+
+    def _is_open(self, slot: int) -> bool:
+        # Same rule as Activity.is_seats_free
+        return self.current[slot] < self.maximum[slot] and not self.open_limit[slot] and self.waitlist[slot] == 0
+
+    def update(self, course_code: str, semester: str, name: str, current: int, maximum: int, waitlist: int, enrollment_controls: bool) -> bool:
+        """
+        Records the latest enrolment of a section
+        :return: True if the section just went from closed (or never seen) to open.
+        """
+        key = f"{course_code}|{semester}|{name}"
+        slot = self.slots.get(key)
+        if slot is None:
+            was_open = False
+            slot = len(self.current)
+            self.slots[key] = slot
+            self.current.append(current)
+            self.maximum.append(maximum)
+            self.waitlist.append(waitlist)
+            self.open_limit.append(enrollment_controls)
+            self.changes += 1
+        else:
+            was_open = self._is_open(slot)
+            if (self.current[slot], self.maximum[slot], self.waitlist[slot], self.open_limit[slot]) != (current, maximum, waitlist, enrollment_controls):
+                self.current[slot] = current
+                self.maximum[slot] = maximum
+                self.waitlist[slot] = waitlist
+                self.open_limit[slot] = enrollment_controls
+                self.changes += 1
+        return not was_open and self._is_open(slot)
+
+    def update_course(self, course: Course) -> set[str]:
+        """
+        Records the latest enrolment of every section of a course
+        :return: The names of the sections which just went from closed to open.
+        """
+        opened = set()
+        for name, current, maximum, waitlist, enrollment_controls in course.section_enrolments():
+            if self.update(course.course_code, course.semester, name, current, maximum, waitlist, enrollment_controls):
+                opened.add(name)
+        return opened
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the store: a header, the keys in slot order, then each array's raw bytes
+        """
+        keys = [None] * len(self.slots)
+        for key, slot in self.slots.items():
+            keys[slot] = key
+        encoded_keys = "\n".join(keys).encode("utf-8")
+        return b"".join([
+            self.MAGIC,
+            struct.pack("<HII", self.VERSION, len(keys), len(encoded_keys)),
+            encoded_keys,
+            self.current.tobytes(),
+            self.maximum.tobytes(),
+            self.waitlist.tobytes(),
+            self.open_limit.tobytes(),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> SectionStateStore:
+        """
+        Rebuilds a store serialized by to_bytes
+        Raises ValueError if the data isn't a store of this version
+        """
+        if data[:4] != cls.MAGIC:
+            raise ValueError("Not a section state file")
+        version, count, keys_length = struct.unpack_from("<HII", data, 4)
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported section state version {version}")
+        offset = 4 + struct.calcsize("<HII")
+        store = cls()
+        if count:
+            keys = data[offset:offset + keys_length].decode("utf-8").split("\n")
+            store.slots = {key: slot for slot, key in enumerate(keys)}
+        offset += keys_length
+        for name in ("current", "maximum", "waitlist", "open_limit"):
+            values = getattr(store, name)
+            size = values.itemsize * count
+            values.frombytes(data[offset:offset + size])
+            offset += size
+        return store
@@ -0,0 +1,36 @@
+# File which contains the timer used to report where startup time goes
+from __future__ import annotations
+import threading
+import time
+
+
+class StartupTimer:
+    """
+    Class which records how long each startup step took, from process start to on_ready
+    Steps can be marked from any thread, since the database and Twilio connect in the background
+    """
+
+    def __init__(self, start: float = None) -> None:
+        self.start = time.perf_counter() if start is None else start
+        self.marks = []
+        self.lock = threading.Lock()
+
+    def mark(self, step: str) -> None:
+        """
+        Records that a startup step just finished
+        """
+        with self.lock:
+            self.marks.append((time.perf_counter(), threading.current_thread().name, step))
+
+    def report(self) -> str:
+        """
+        Returns a table of every step, with its time since process start and since the previous step on the same thread
+        """
+        with self.lock:
+            marks = sorted(self.marks)
+        previous = {}
+        lines = ["Startup timing (ms):", f"{'since start':>12} {'step':>9}  {'thread':<18} step"]
+        for timestamp, thread, step in marks:
+            lines.append(f"{(timestamp - self.start) * 1000:12.1f} {(timestamp - previous.get(thread, self.start)) * 1000:9.1f}  {thread:<18} {step}")
+            previous[thread] = timestamp
+        return "\n".join(lines)
@@ -0,0 +1,88 @@
+# File which contains the incremental parser for large getPageableCourses replies
+from __future__ import annotations
+import json
+import re
+
+
+class CourseStreamParser:
+    """
+    Class which pulls the courses out of a getPageableCourses reply as it arrives, one course at a time,
+    instead of loading the whole body into one nested dict.
+    Text is fed in chunks with feed(), which returns every course completed so far. Only the courses array
+    (payload.pageableCourse.courses) is decoded; everything around it is skimmed for its structure and thrown away
+    """
+    PATH = ("payload", "pageableCourse", "courses")
+    # A complete string, a lone quote (a string which continues in the next chunk), or a structural character
+    TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|"|[{}\[\]:]')
+    WHITESPACE = re.compile(r"[\s,]*")
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        # One [container, key] entry per open object or array around the current position
+        self.stack = []
+        self.last_string = None
+        self.in_courses = False
+        self.done = False
+        self.decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> list[dict]:
+        """
+        Adds the next chunk of the reply, and returns the courses which are now complete
+        """
+        if self.done:
+            return []
+        self.buffer += text
+        position = 0
+        if not self.in_courses:
+            position = self._find_courses()
+        courses = []
+        if self.in_courses:
+            position = self._read_courses(position, courses)
+        self.buffer = self.buffer[position:]
+        return courses
+
+    def _find_courses(self) -> int:
+        """
+        Walks the reply's structure until the start of the courses array
+        :return: The position up to which the buffer has been consumed.
+        """
+        position = 0
+        for token in self.TOKEN.finditer(self.buffer):
+            value = token.group()
+            if value == '"':
+                # This string isn't complete yet, so wait for the next chunk before going past it
+                return token.start()
+            if value[0] == '"':
+                self.last_string = value
+            elif value == ":":
+                if self.stack and self.last_string is not None:
+                    self.stack[-1][1] = json.loads(self.last_string)
+            elif value in "{[":
+                if value == "[" and tuple(entry[1] for entry in self.stack) == self.PATH:
+                    self.in_courses = True
+                    return token.end()
+                self.stack.append([value, None])
+            else:
+                self.stack.pop()
+            position = token.end()
+        return position
+
+    def _read_courses(self, position: int, courses: list[dict]) -> int:
+        """
+        Decodes every complete course in the buffer, starting at position
+        :return: The position up to which the buffer has been consumed.
+        """
+        while True:
+            position = self.WHITESPACE.match(self.buffer, position).end()
+            if position == len(self.buffer):
+                return position
+            if self.buffer[position] == "]":
+                self.done = True
+                return len(self.buffer)
+            try:
+                course, end = self.decoder.raw_decode(self.buffer, position)
+            except json.JSONDecodeError:
+                # The course continues in the next chunk
+                return position
+            courses.append(course)
+            position = end
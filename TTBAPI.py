@@ -1,11 +1,56 @@
+from __future__ import annotations
 from Courses import *
+import asyncio
+import codecs
+import copy
+import hashlib
+import time
+from typing import AsyncIterator
 import aiohttp
+try:
+    # orjson decodes the large TTB replies several times faster than the standard library
+    from orjson import loads
+except ImportError:
+    from json import loads
+from RateLimiter import TokenBucket
+from CourseCache import CourseCache
+from StreamParser import CourseStreamParser
+from Resilience import Backoff, CircuitBreaker
+import Metrics
 
 class TTBAPI:
     """
     Class which abstracts all interactions with the UofT TTB API.
     """
-    def __init__(self) -> None:
+    def __init__(self, url: str = "https://api.easi.utoronto.ca/ttb/getPageableCourses", pool_size: int = 10, dns_cache_ttl: int = 300, rate_limit: float = 10, burst: int = 10, cache_ttl: float = 15, cache_size: int = 2048,
+                 timeout: float = 10, retries: int = 2, backoff: float = 0.5, breaker_threshold: int = 5, breaker_reset: float = 30, hedge_after: float = None) -> None:
+        self.url = url
+        # Every attempt gets its own timeout. Timeouts, connection errors, 429s and 5xx replies are retried
+        # up to `retries` more times with jittered exponential backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # Catalog pages are large and streamed, so only the gaps between chunks are timed
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.retries = retries
+        self.backoff = Backoff(backoff)
+        # Stops sending requests for a while once the TTB host keeps failing
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        Metrics.ttb_circuit_open.set_function(lambda: int(self.breaker.state != CircuitBreaker.CLOSED))
+        # Hedged lookups send a second request if the first hasn't answered within hedge_after seconds, and use
+        # whichever answers first. None disables hedging
+        self.hedge_after = hedge_after
+        # (course code, semester) -> (fingerprint of the last raw reply, the Course parsed from it).
+        # A reply identical to the last one isn't parsed again; the previous Course object is handed back instead
+        self.fingerprints = {}
+        # Code prefix -> one (fingerprint, courses parsed from it) per page of the prefix's last grouped reply
+        self.group_fingerprints = {}
+        self.cache = CourseCache(cache_ttl, cache_size)
+        # Every request to the TTB host takes a token from this bucket, no matter who makes it
+        self.rate_limiter = TokenBucket(rate_limit, burst)
+        # One long-lived session is shared by every request, so connections to the TTB host are kept alive
+        # and reused instead of paying for a new TCP/TLS handshake on every course lookup
+        self.session = None
+        self.pool_size = pool_size
+        self.dns_cache_ttl = dns_cache_ttl
         self.headers = {
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -24,6 +69,7 @@ class TTBAPI:
             'sec-ch-ua-platform': '"Windows"',
         }
 
+        # Template for the request body. It is never modified: every request builds its own copy
         self.json_data = {
             'courseCodeAndTitleProps': {
                 'courseCode': '',
@@ -58,43 +104,328 @@ class TTBAPI:
             'pageSize': 1625,
             'direction': 'asc',
         }
-        self.version = "TTBAPI V2.1"
+        self.version = "TTBAPI V2.2"
 
-    async def _make_request(self, course_code: str, semester: str) -> dict:
+    async def open(self) -> None:
         """
-        Makes a request to the TTB API to get info on a course.
+        Opens the pooled HTTP session used for every request to the TTB API
+        Does nothing if the session is already open
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=self.dns_cache_ttl, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+
+    async def close(self) -> None:
+        """
+        Closes the pooled HTTP session and all of its connections
+        """
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def _request_body(self, course_code: str, semester: str, page: int = 1) -> bytes:
+        """
+        Makes a request to the TTB API to get info on a course, and returns the raw body of the reply without decoding it
         Precondition: Coursecode is a valid coursecode, and semester is a valid semester
         Which coursecode is offered in
+        An empty course_code and semester returns every course in the active sessions, one page at a time
+        Raises TTBAPIUnavailableException if the TTB API doesn't give a usable reply, even after retrying
         """
-        self.json_data['courseCodeAndTitleProps']['courseCode'] = course_code
-        self.json_data['courseCodeAndTitleProps']['courseSectionCode'] = semester
+        payload = self._build_payload(course_code, semester, page)
         # ===== OLD SYNCRENOUS APPROACH =======
         # response = requests.post(
         # 'https://api.easi.utoronto.ca/ttb/getPageableCourses', headers=self.headers, json=self.json_data)
         # x = response.json()
         # return x
-        async with aiohttp.ClientSession() as session:
-            async with session.post("https://api.easi.utoronto.ca/ttb/getPageableCourses", headers=self.headers, json=self.json_data) as response:
-                # Check for successful status code (e.g., 200 OK)
-                if response.status == 200:
-                    data = await response.json()
-                    return data
+        await self.open()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await self._wait_before_retry(attempt, error)
+            self._check_circuit()
+            await self.rate_limiter.acquire()
+            try:
+                return await self._attempt_request(payload)
+            except TransientTTBAPIError as e:
+                error = e
+        raise TTBAPIUnavailableException(f"The TTB API failed {self.retries + 1} times in a row: {error}")
+
+    async def _attempt_request(self, payload: dict) -> bytes:
+        """
+        Sends one request to the TTB API and returns the raw body of the reply
+        Raises TransientTTBAPIError if it's worth retrying, and TTBAPIUnavailableException if it isn't
+        """
+        start = time.perf_counter()
+        status = None
+        try:
+            async with self.session.post(self.url, json=payload, timeout=self.timeout) as response:
+                status = str(response.status)
+                self._check_status(response)
+                body = await response.read()
+                self.breaker.record_success()
+                return body
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = status or type(e).__name__
+            self.breaker.record_failure()
+            raise TransientTTBAPIError(f"{type(e).__name__}: {e}") from e
+        finally:
+            # Frees the circuit breaker's trial slot if this request was cancelled
+            self.breaker.release()
+            self._record_request(status or "no_response", start)
+
+    def _check_status(self, response: aiohttp.ClientResponse) -> None:
+        """
+        Raises the right exception for a reply which isn't 200, and tells the circuit breaker about it
+        """
+        if response.status == 200:
+            return
+        if response.status == 429 or response.status >= 500:
+            self.breaker.record_failure()
+            retry_after = response.headers.get("Retry-After", "")
+            raise TransientTTBAPIError(f"HTTP {response.status}", float(retry_after) if retry_after.isdigit() else 0)
+        # The host is up, the request was just refused, so retrying won't help
+        self.breaker.record_success()
+        raise TTBAPIUnavailableException(f"The TTB API replied with HTTP {response.status}")
+
+    def _check_circuit(self) -> None:
+        """
+        Raises TTBAPIUnavailableException instead of sending a request while the circuit breaker is open
+        """
+        if not self.breaker.allow():
+            Metrics.ttb_requests.inc("circuit_open")
+            raise TTBAPIUnavailableException(f"The TTB API is failing, so requests are paused for another {self.breaker.retry_after():.0f} seconds")
 
-    async def get_course(self, course_code: str, semester: str) -> Course:
+    async def _wait_before_retry(self, attempt: int, error: TransientTTBAPIError) -> None:
+        Metrics.ttb_retries.inc()
+        # Honour the host's Retry-After, within the backoff's cap
+        await asyncio.sleep(max(self.backoff.delay(attempt - 1), min(error.retry_after, self.backoff.cap)))
+
+    def _record_request(self, status: str, start: float) -> None:
+        """
+        Records a finished request's status and latency in the runtime metrics
+        """
+        Metrics.ttb_requests.inc(status)
+        Metrics.ttb_request_seconds.observe(time.perf_counter() - start)
+
+    def _build_payload(self, course_code: str, semester: str, page: int = 1) -> dict:
+        """
+        Returns a new request body for the given course code, semester and page
+        Each request gets its own copy so that requests can safely overlap
+        """
+        payload = copy.deepcopy(self.json_data)
+        payload['courseCodeAndTitleProps']['courseCode'] = course_code
+        payload['courseCodeAndTitleProps']['courseSectionCode'] = semester
+        payload['page'] = page
+        return payload
+
+    async def get_course(self, course_code: str, semester: str, hedge: bool = False) -> Course:
         """
         Returns a Course object from the TTB API
+        Replies are cached for a short time, and concurrent lookups of the same course share one request
+        If hedge is set (and hedging is enabled), a slow request is raced against a second one
+        Raises CourseNotFoundException if the course is deemed to be invalid,
+        and TTBAPIUnavailableException if the TTB API can't be reached
+        """
+        return await self.cache.get((course_code, semester), lambda: self._fetch_course(course_code, semester, hedge))
+
+    async def poll_course(self, course_code: str, semester: str, hedge: bool = False) -> Course:
+        """
+        Requests a course from the TTB API without reading the cache, so pollers always see the latest enrolment,
+        then caches the reply for other lookups
+        Raises CourseNotFoundException if the course is deemed to be invalid,
+        and TTBAPIUnavailableException if the TTB API can't be reached
+        """
+        course = await self._fetch_course(course_code, semester, hedge)
+        self.cache.put((course_code, semester), course)
+        return course
+
+    async def _fetch_course(self, course_code: str, semester: str, hedge: bool = False) -> Course:
+        """
+        Requests a course from the TTB API, bypassing the cache
         Raises CourseNotFoundException if the course is deemed to be invalid
         """
-        try:
-            response = await self._make_request(course_code, semester)
-            course = response['payload']['pageableCourse']['courses'][0]
-            to_return = Course(course['name'], course['code'], course['sectionCode'])
-            activities = course['sections']
-            for activity in activities:
-                to_return.add_activity(Activity(activity['name'], activity['type'], activity['currentEnrolment'], activity['maxEnrolment'], activity['openLimitInd'] != 'N', activity.get('currentWaitlist', 0)))
-            return to_return
-        except IndexError:
+        if hedge and self.hedge_after is not None:
+            body = await self._hedged(lambda: self._request_body(course_code, semester))
+        else:
+            body = await self._request_body(course_code, semester)
+        key = (course_code, semester)
+        fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+        previous = self.fingerprints.get(key)
+        if previous is not None and previous[0] == fingerprint:
+            Metrics.ttb_unchanged_replies.inc()
+            return previous[1]
+        courses = self._courses_in(body)
+        if not courses:
             raise CourseNotFoundException("Invalid course code or semester")
+        course = self._parse_course(courses[0])
+        self.fingerprints[key] = (fingerprint, course)
+        return course
+
+    def forget_fingerprints(self, keep) -> None:
+        """
+        Forgets the last reply of every course which isn't in keep, e.g. courses nobody tracks anymore,
+        and of every group which no course in keep belongs to
+        """
+        keep = set(keep)
+        for key in self.fingerprints.keys() - keep:
+            del self.fingerprints[key]
+        for prefix in list(self.group_fingerprints):
+            if not any(course_code.startswith(prefix) for course_code, _ in keep):
+                del self.group_fingerprints[prefix]
+
+    async def get_course_group(self, prefix: str) -> dict[tuple[str, str], Course]:
+        """
+        Returns every course whose code starts with prefix (e.g. a department's "CSC"), in every semester,
+        keyed by (course code, semester). One request covers the whole group, paging only if it has more than pageSize courses.
+        Pages which are identical to the last reply for this prefix aren't parsed again; their previous Course objects are reused.
+        Every course is also put in the course cache
+        Raises TTBAPIUnavailableException if the TTB API can't be reached
+        """
+        previous = self.group_fingerprints.get(prefix, [])
+        pages = []
+        while True:
+            body = await self._request_body(prefix, "", len(pages) + 1)
+            fingerprint = hashlib.blake2b(body, digest_size=16).digest()
+            index = len(pages)
+            if index < len(previous) and previous[index][0] == fingerprint:
+                Metrics.ttb_unchanged_replies.inc()
+                pages.append(previous[index])
+                # The last time round, the group ended on this page
+                if index == len(previous) - 1:
+                    break
+                continue
+            replies = self._courses_in(body)
+            parsed = [self._parse_course(course) for course in replies]
+            pages.append((fingerprint, {(course.course_code, course.semester): course for course in parsed}))
+            # A short page means there are no more courses
+            if len(replies) < self.json_data['pageSize']:
+                break
+        self.group_fingerprints[prefix] = pages
+        courses = {}
+        for _, page in pages:
+            courses.update(page)
+        for key, course in courses.items():
+            self.cache.put(key, course)
+        return courses
+
+    async def _hedged(self, make_request) -> dict:
+        """
+        Starts a request, and if it hasn't finished after hedge_after seconds, starts an identical one
+        Returns the first successful reply and cancels the other request. If both fail, the first one's exception is raised
+        """
+        first = asyncio.ensure_future(make_request())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+        Metrics.ttb_hedged_requests.inc()
+        pending = {first, asyncio.ensure_future(make_request())}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_catalog(self) -> CatalogSnapshot:
+        """
+        Returns a CatalogSnapshot of every course in the active sessions
+        Pages through getPageableCourses with an empty course code, so the number of requests
+        depends on the size of the catalog rather than on how many courses are tracked
+        """
+        catalog = CatalogSnapshot()
+        async for course in self.iter_catalog():
+            catalog.add_course(course)
+        return catalog
+
+    async def iter_catalog(self) -> AsyncIterator[Course]:
+        """
+        Yields every course in the active sessions, one at a time, as the replies arrive
+        Only one course of a reply is decoded at a time, so memory stays bounded however large the catalog is
+        """
+        page = 1
+        while True:
+            count = 0
+            async for course in self._stream_request("", "", page):
+                count += 1
+                yield self._parse_course(course)
+            # A short page means there are no more courses
+            if count < self.json_data['pageSize']:
+                return
+            page += 1
+
+    async def _stream_request(self, course_code: str, semester: str, page: int = 1) -> AsyncIterator[dict]:
+        """
+        Makes the same request as _request_body, but reads the reply incrementally and
+        yields the raw dictionary of each course in it as soon as it has been received
+        A request which fails before any course has been yielded is retried like _request_body's; one which fails part way isn't
+        Raises TTBAPIUnavailableException if the TTB API doesn't give a usable reply
+        """
+        payload = self._build_payload(course_code, semester, page)
+        await self.open()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await self._wait_before_retry(attempt, error)
+            self._check_circuit()
+            await self.rate_limiter.acquire()
+            start = time.perf_counter()
+            status = None
+            yielded = False
+            try:
+                async with self.session.post(self.url, json=payload, timeout=self.stream_timeout) as response:
+                    status = str(response.status)
+                    self._check_status(response)
+                    parser = CourseStreamParser()
+                    decoder = codecs.getincrementaldecoder("utf-8")()
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        for course in parser.feed(decoder.decode(chunk)):
+                            yielded = True
+                            yield course
+                    for course in parser.feed(decoder.decode(b"", final=True)):
+                        yield course
+                    if not parser.done:
+                        raise TTBAPIUnavailableException("The TTB API sent a malformed reply: no complete courses array")
+                    self.breaker.record_success()
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = status or type(e).__name__
+                self.breaker.record_failure()
+                if yielded:
+                    raise TTBAPIUnavailableException(f"The TTB API reply broke off part way: {type(e).__name__}: {e}") from e
+                error = TransientTTBAPIError(f"{type(e).__name__}: {e}")
+            except UnicodeDecodeError as e:
+                raise TTBAPIUnavailableException(f"The TTB API sent a malformed reply: {e}") from e
+            except TransientTTBAPIError as e:
+                error = e
+            finally:
+                self.breaker.release()
+                self._record_request(status or "no_response", start)
+        raise TTBAPIUnavailableException(f"The TTB API failed {self.retries + 1} times in a row: {error}")
+
+    def _courses_in(self, body: bytes) -> list[dict]:
+        """
+        Returns the raw course entries of a getPageableCourses reply
+        Raises TTBAPIUnavailableException if the body isn't a getPageableCourses reply
+        """
+        try:
+            courses = loads(body)['payload']['pageableCourse']['courses']
+        except (ValueError, KeyError, TypeError) as e:
+            raise TTBAPIUnavailableException(f"The TTB API sent a malformed reply: {type(e).__name__}: {e}") from e
+        if not isinstance(courses, list):
+            raise TTBAPIUnavailableException("The TTB API sent a malformed reply: courses isn't a list")
+        return courses
+
+    def _parse_course(self, course: dict) -> Course:
+        """
+        Builds a Course object from a single entry of a getPageableCourses reply
+        Raises TTBAPIUnavailableException if the entry is missing fields
+        """
+        try:
+            return Course.from_payload(course)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise TTBAPIUnavailableException(f"The TTB API sent a malformed course: {type(e).__name__}: {e}") from e
 
     async def validate_course(self, coursecode: str, semester: str, activity: str):
         """
@@ -120,6 +451,21 @@ class InvalidActivityException(Exception):
     """
     pass
 
+class TTBAPIUnavailableException(Exception):
+    """
+    Exception which is raised when the TTB API can't be reached or keeps failing, or while its circuit breaker is open
+    """
+    pass
+
+class TransientTTBAPIError(Exception):
+    """
+    Exception which is raised for a failed attempt which is worth retrying (timeouts, connection errors, 429s and 5xx replies)
+    retry_after is how long the host asked us to wait, in seconds, if it said
+    """
+    def __init__(self, message: str, retry_after: float = 0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
 if __name__ == '__main__':
     api = TTBAPI()
 
@@ -4,24 +4,82 @@ This file contains all the classes required to track courses at UofT
 This file was created in an attempt to modularize each university, to make it easier to 
 add more universities in the future
 """
+import asyncio
+import os
 import re
+import time
 import nextcord
 from nextcord import Interaction, SlashOption
 from nextcord.ext import commands, tasks
-from TTBAPI import TTBAPI, CourseNotFoundException, InvalidActivityException
-from Mongo import Mongo
+from TTBAPI import TTBAPI, CourseNotFoundException, InvalidActivityException, TTBAPIUnavailableException
+from AsyncMongo import AsyncMongo
+from Poller import CoursePoller
+from Notifier import NotificationDispatcher
+import Metrics
+from Profiling import profiler
+from WarmStart import WarmStartSnapshot
+from Scheduler import AdaptivePollScheduler, EnrolmentCalendar
+from EnrolmentHistory import EnrolmentHistory
 from CommonUtils import *
+from EmbedTemplates import embed_templates
 from UserContact import UserContact
 from Courses import Course, Activity
 
 
 class UofT(commands.Cog):
-    def __init__(self, bot: commands.Bot, database: Mongo, contact: UserContact) -> None:
+    def __init__(self, bot: commands.Bot, database: AsyncMongo, contact: UserContact) -> None:
         self.bot = bot
-        self.ttbapi = TTBAPI()
+        self.concurrency = int(os.getenv("TTB_CONCURRENCY", 8))
+        hedge_after = float(os.getenv("TTB_HEDGE_AFTER", 0))
+        self.ttbapi = TTBAPI(pool_size=self.concurrency, rate_limit=float(os.getenv("TTB_RATE_LIMIT", 10)), burst=int(os.getenv("TTB_RATE_BURST", 10)), cache_ttl=float(os.getenv("TTB_CACHE_TTL", 15)), cache_size=int(os.getenv("TTB_CACHE_SIZE", 2048)),
+                             timeout=float(os.getenv("TTB_TIMEOUT", 10)), retries=int(os.getenv("TTB_RETRIES", 2)), backoff=float(os.getenv("TTB_BACKOFF", 0.5)),
+                             breaker_threshold=int(os.getenv("TTB_BREAKER_THRESHOLD", 5)), breaker_reset=float(os.getenv("TTB_BREAKER_RESET", 30)), hedge_after=hedge_after if hedge_after > 0 else None)
+        # Courses with at least this many subscribers are "hot", and their lookups are hedged (if TTB_HEDGE_AFTER is set)
+        self.hedge_subscribers = int(os.getenv("TTB_HEDGE_SUBSCRIBERS", 10))
+        self.poller = CoursePoller(self.ttbapi, self.concurrency)
+        self.notifier = NotificationDispatcher(bot, database, contact, workers=int(os.getenv("NOTIFY_WORKERS", 8)), twilio_threads=int(os.getenv("TWILIO_THREADS", 4)))
         self.utils = UofTUtils()
         self.database = database
         self.contact = contact
+        # Latest polled courses and the last seen enrolment of every polled section (so vacancies are only
+        # reported when a section opens), loaded from disk so a restart doesn't start from nothing
+        self.warm_start_file = os.getenv("WARM_START_FILE", "warm_start.bin")
+        self.warm_start_save_ticks = int(os.getenv("WARM_START_SAVE_TICKS", 15))
+        self.snapshot = WarmStartSnapshot.load(self.warm_start_file, float(os.getenv("WARM_START_MAX_AGE", 3600)))
+        self.section_states = self.snapshot.section_states
+        Metrics.sections_tracked.set_function(lambda: len(self.section_states))
+        # The watch index only exists once the database has connected, and reading it before then would block
+        Metrics.courses_watched.set_function(lambda: len(database.watch_index) if database.connection.done() else 0)
+        # Prime the course cache, so /uoft commands right after a restart don't each have to hit the TTB API.
+        # The refresh loop doesn't read the cache, so these courses are still polled as soon as they're due
+        for key, course in self.snapshot.courses.items():
+            self.ttbapi.cache.put(key, course, ttl=float(os.getenv("WARM_START_TTL", 300)))
+        self.ticks = 0
+        # section_states.changes as of the last save, so the snapshot is saved as soon as any section's enrolment changes
+        self.saved_changes = self.section_states.changes
+        # (course code, semester) -> (Course object, tracked activities) as of the course's last evaluation
+        self.evaluated = {}
+        # Append-only record of every polled section's enrolment, for /uoft history
+        self.history = EnrolmentHistory(os.getenv("HISTORY_DIRECTORY", "history"))
+        # "course" polls each tracked course individually, "grouped" polls them a department (code prefix) at a time,
+        # "snapshot" pulls the whole catalog once per tick
+        self.polling_mode = os.getenv("TTB_POLLING_MODE", "course")
+        # In "grouped" mode, courses sharing this many leading characters of their code are fetched with one request
+        self.group_prefix_length = int(os.getenv("TTB_GROUP_PREFIX", 3))
+        if self.polling_mode in ("course", "grouped"):
+            # Each course gets its own polling interval, so the loop ticks often and only polls the courses which are due
+            self.scheduler = AdaptivePollScheduler(
+                EnrolmentCalendar.load(os.getenv("ENROLMENT_WINDOWS_FILE", "enrolment_windows.json")),
+                base_interval=float(os.getenv("POLL_BASE_INTERVAL", 30)),
+                min_interval=float(os.getenv("POLL_MIN_INTERVAL", 3)),
+                max_interval=float(os.getenv("POLL_MAX_INTERVAL", 600)),
+                budget_per_minute=float(os.getenv("POLL_BUDGET_PER_MINUTE", 300)),
+            )
+            self.refresh.change_interval(seconds=float(os.getenv("POLL_TICK_SECONDS", 2)))
+            # Courses we already have a snapshot of can wait a little, instead of all being polled at once on startup
+            self.scheduler.stagger(self.snapshot.courses.keys())
+        else:
+            self.scheduler = None
         self.refresh.start()
         self.version = "UofTModule V 2.1\n" + self.ttbapi.version
 
@@ -32,21 +90,126 @@ class UofT(commands.Cog):
         And notifies users when their desired course is availible
         """
         await self.bot.wait_until_ready()
-        # Get a list of all the courses in the database
-        courses = self.database.get_all_courses()
-        for course in courses:
-            course_object = await self.ttbapi.get_course(
-                course["course_code"], course["semester"])
-            for activity in course['activities']:
-                if "New" in activity:
-                    # If this activity is checking for new sections being opened
-                    await self.check_for_new_sections(course, activity)
+        profiler.tick_started()
+        start = time.perf_counter()
+        try:
+            # Get a list of all the tracked courses from the in-memory watch index
+            courses = self.database.watch_index.snapshot()
+            subscribers = {(course["course_code"], course["semester"]): sum(len(users) for users in course["activities"].values()) for course in courses}
+            course_objects = await self._fetch_courses(courses, subscribers)
+            if course_objects is None:
+                # Nothing was fetched, so there's nothing to check, and the snapshot must not be replaced with nothing
+                return
+            Metrics.courses_per_tick.observe(len(course_objects))
+            # Record every polled section, and remember which ones just went from closed to open.
+            # TTBAPI hands back the very same Course object when a course's reply hasn't changed, so a course whose
+            # object and tracked activities are both the same as when it was last evaluated has nothing new to report
+            opened = {}
+            unchanged = set()
+            evaluated = {}
+            watched = {(course["course_code"], course["semester"]): frozenset(course["activities"]) for course in courses}
+            for key, course_object in course_objects.items():
+                last = self.evaluated.get(key)
+                if last is not None and last[0] is course_object and last[1] == watched.get(key):
+                    unchanged.add(key)
+                    if self.scheduler is not None:
+                        self.scheduler.record(key, subscribers.get(key, 0), False)
                     continue
-                activity_object = course_object.get_activity(activity)
-                if activity_object.is_seats_free():
-                    # If an activity has seats free, then we need to notify the users
-                    message = f"Seats are availible for {course['course_code']} - {course_object.get_name()}, {self._format_activity(activity)}, in {self._format_semester(course['semester'])}"
-                    await self._contact_users(course["activities"][activity], course["course_code"], course["semester"], activity, message)
+                if key in watched:
+                    evaluated[key] = (course_object, watched[key])
+                changes = self.section_states.changes
+                opened[key] = self.section_states.update_course(course_object)
+                self._record_history(course_object)
+                if self.scheduler is not None:
+                    # Tell the scheduler whether this course's enrolment changed, so it can poll it sooner or later next time
+                    self.scheduler.record(key, subscribers.get(key, 0), self.section_states.changes != changes)
+            for course in courses:
+                course_object = course_objects.get((course["course_code"], course["semester"]))
+                if course_object is None or (course["course_code"], course["semester"]) in unchanged:
+                    continue
+                for activity in course['activities']:
+                    if "New" in activity:
+                        # If this activity is checking for new sections being opened
+                        await self.check_for_new_sections(course, activity, course_object)
+                        continue
+                    if activity in opened[(course["course_code"], course["semester"])]:
+                        # If an activity has just opened up, then we need to notify the users
+                        message = f"Seats are availible for {course['course_code']} - {course_object.get_name()}, {self._format_activity(activity)}, in {self._format_semester(course['semester'])}"
+                        await self._contact_users(course["activities"][activity], course["course_code"], course["semester"], activity, message)
+            self.evaluated.update(evaluated)
+            # Write this tick's enrolment samples as one batch
+            await asyncio.get_running_loop().run_in_executor(None, self.history.flush)
+            # The snapshot now matches what the TTB API says. It's saved whenever a section changed, so a crash doesn't lose
+            # the edge state and re-report sections after the restart, and every few ticks otherwise
+            if self.polling_mode == "snapshot":
+                self.snapshot.courses = course_objects
+            else:
+                self.snapshot.courses = {key: course for key, course in {**self.snapshot.courses, **course_objects}.items() if key in watched}
+            # /uoft lookups fingerprint courses in every mode, so untracked ones are forgotten in every mode
+            self.ttbapi.forget_fingerprints(watched)
+            self.evaluated = {key: value for key, value in self.evaluated.items() if key in watched}
+            self.snapshot.confirm(course_objects)
+            self.ticks += 1
+            if self.section_states.changes != self.saved_changes or self.ticks % self.warm_start_save_ticks == 0:
+                self.saved_changes = self.section_states.changes
+                await asyncio.get_running_loop().run_in_executor(None, self.snapshot.save, self.warm_start_file)
+        finally:
+            profiler.tick_finished()
+            duration = time.perf_counter() - start
+            Metrics.tick_seconds.observe(duration)
+            if duration > self.refresh.seconds:
+                Metrics.tick_overruns.inc()
+
+    def _record_history(self, course_object: Course) -> None:
+        """
+        Buffers the current enrolment of every section of a course in the enrolment history
+        """
+        for name, current, maximum, waitlist, _ in course_object.section_enrolments():
+            self.history.record(course_object.course_code, course_object.semester, name, current, maximum, waitlist)
+
+    @refresh.before_loop
+    async def before_refresh(self) -> None:
+        """
+        Opens the TTB API's pooled session and starts the notification workers once the bot is up, before the first refresh
+        """
+        await self.bot.wait_until_ready()
+        await self.database.wait_until_connected()
+        await self.ttbapi.open()
+        self.notifier.start()
+
+    def cog_unload(self) -> None:
+        """
+        Stops polling and notifying, and closes the TTB API's pooled session when the cog is removed
+        """
+        self.refresh.cancel()
+        self.bot.loop.create_task(self.notifier.stop())
+        self.bot.loop.create_task(self.ttbapi.close())
+        self.snapshot.save(self.warm_start_file)
+        self.history.flush()
+
+    async def _fetch_courses(self, courses: list[dict], subscribers: dict[tuple[str, str], int]) -> dict[tuple[str, str], Course] | None:
+        """
+        Returns a Course object for every course polled this tick, keyed by (course code, semester)
+        In "snapshot" mode the whole catalog is pulled once, and every course in it is returned.
+        In "grouped" mode the tracked courses the scheduler says are due are requested a group (code prefix) at a time,
+        otherwise they are requested individually, many at a time.
+        Courses which couldn't be fetched are left out, so they're simply checked again on a later tick.
+        Returns None if the catalog pull fails in "snapshot" mode, so the tick is skipped
+        """
+        if self.polling_mode == "snapshot":
+            try:
+                catalog = await self.ttbapi.get_catalog()
+            except TTBAPIUnavailableException as e:
+                print(f"Couldn't pull the course catalog, skipping this tick: {e}")
+                return None
+            return catalog.courses
+        due = self.scheduler.due(courses)
+        if self.polling_mode == "grouped":
+            # Each group's reply covers all of its courses, so every tracked course in a group with a due course is refreshed
+            prefixes = {course_code[:self.group_prefix_length] for course_code, _ in due}
+            return await self.poller.poll_grouped([key for key in subscribers if key[0][:self.group_prefix_length] in prefixes], self.group_prefix_length)
+        hot = {key for key, count in subscribers.items() if count >= self.hedge_subscribers} if self.ttbapi.hedge_after is not None else frozenset()
+        return await self.poller.poll(due, hot)
 
     def _format_activity(self, activity: str):
         activity_map = {"LEC": "Lecture", "TUT": "Tutorial", "PRA": "Practical"}
@@ -61,21 +224,20 @@ class UofT(commands.Cog):
         mapping = {"F": "Fall", "S": "Winter", "Y": "Full Year"}
         return mapping[semester]
 
-    async def check_for_new_sections(self, course: dict, activity: str) -> None:
+    async def check_for_new_sections(self, course: dict, activity: str, course_object: Course) -> None:
         course_code = course["course_code"]
         semester = course["semester"]
         # Get the current course sections
-        course_object = await self.ttbapi.get_course(course_code, semester)
         activities = course_object.get_activity_by_type(activity[3:])
         # sort the activities by their section number
         activities.sort()
-        if not self.database.is_course_sections_in_database(course_code, semester, activity[3:]):
-            self.database.add_course_sections(
+        if not await self.database.is_course_sections_in_database(course_code, semester, activity[3:]):
+            await self.database.add_course_sections(
                 course_code, semester, activity[3:], activities)
             return
         # If the course has been added to the database, then we need to check if there are any new sections
         # Get teh sections from the database
-        current_sections = self.database.get_course_sections(
+        current_sections = await self.database.get_course_sections(
             course_code, semester, activity[3:])
         # We can convert the two lists into sets and then find the difference between them
         # If we have a difference, then we need to notify the users
@@ -89,22 +251,15 @@ class UofT(commands.Cog):
             message = f"New sections have been opened for {course_code} {word_mappings[activity]} in {semester}: {', '.join(list(new_sections))}"
             await self._contact_users(users, course_code, semester, activity, message)
             # Update the database with the new sections
-            self.database.add_course_sections(
+            await self.database.add_course_sections(
                 course_code, semester, activity[3:], activities)
 
     async def _contact_users(self, users: list[int], coursecode: str, semester: str, activity: str, message: str) -> None:
         """
-        Method which contacts all users in the given list
+        Method which queues a notification for all users in the given list
+        Delivery happens on the notifier's workers, so polling never waits on Discord or Twilio
         """
-        for user in users:
-            # Step 1: contact via discord
-            discord_user = self.bot.get_user(user)
-            await discord_user.send(message)
-            self.contact.contact_user(
-                self.database.get_user_profile(user), message, self.database.get_user_dlc(user))
-            # Remove the user from the database
-            self.database.remove_tracked_activity(
-                user, coursecode, semester, activity)
+        self.notifier.enqueue(users, coursecode, semester, activity, message)
 
     @nextcord.slash_command(name="uoft", description="Main command for all UofT related commands")
     async def uoft(self, interaction: Interaction):
@@ -135,28 +290,31 @@ class UofT(commands.Cog):
             # Since it's just LEC/PRA/TUT. This is fine because we'll deal with it
             # In the scraping function
             pass
-        if not self.database.is_user_in_db(interaction.user.id):
+        except TTBAPIUnavailableException:
+            await interaction.response.send_message("UofT's timetable isn't responding right now, so the course can't be checked. Please try again in a few minutes", ephemeral=True)
+            return
+        if not await self.database.is_user_in_db(interaction.user.id):
             # Create a profile for the user, then set the embed footer as "Remember to setup your profile"
-            self.database.add_user_to_db(interaction.user.id, {})
-            self.database.add_blank_dlc(interaction.user.id)
-            footer = "Remember to setup your profile using /profile! Remaining free tracked activities: " + str(self.database.get_user_dlc(interaction.user.id)['max_tracked_activities'] - len(self.database.get_user_tracked_activities(interaction.user.id)) - 1)
+            await self.database.add_user_to_db(interaction.user.id, {})
+            await self.database.add_blank_dlc(interaction.user.id)
+            footer = "Remember to setup your profile using /profile! Remaining free tracked activities: " + str((await self.database.get_user_dlc(interaction.user.id))['max_tracked_activities'] - len(await self.database.get_user_tracked_activities(interaction.user.id)) - 1)
         else:
-            footer = "Remaining free tracked activities: " + str(self.database.get_user_dlc(interaction.user.id)['max_tracked_activities'] - len(self.database.get_user_tracked_activities(interaction.user.id)) - 1)
+            footer = "Remaining free tracked activities: " + str((await self.database.get_user_dlc(interaction.user.id))['max_tracked_activities'] - len(await self.database.get_user_tracked_activities(interaction.user.id)) - 1)
 
         # If we're here, then the course is valid, and we can add it to the database
         # But first, we need to check if the course is already in the database
-        if self.database.is_user_tracking_activity(interaction.user.id, course_code, session, activity):
+        if await self.database.is_user_tracking_activity(interaction.user.id, course_code, session, activity):
             await interaction.send("You are already tracking this course/activity combination", ephemeral=True)
             return
     
             # If the user's current tracked activities is greater than the allotted amount, don't allow them to add more
-        user_activites = self.database.get_user_tracked_activities(interaction.user.id)
-        user_dlc = self.database.get_user_dlc(interaction.user.id)
+        user_activites = await self.database.get_user_tracked_activities(interaction.user.id)
+        user_dlc = await self.database.get_user_dlc(interaction.user.id)
         if len(user_activites) == user_dlc['max_tracked_activities']:
             await interaction.response.send_message("You have reached the maximum amount of tracked activities. Please remove some activities before adding more, or consider upgrading your account to add more activities", ephemeral=True)
             return
         
-        self.database.add_tracked_activity(
+        await self.database.add_tracked_activity(
             interaction.user.id, course_code, session, f"New{activity}")
         embed = nextcord.Embed(
             title="Course Added", description=f"Successfully added {course_code} {activity} to your tracked courses", color=nextcord.Color.blue())
@@ -185,28 +343,31 @@ class UofT(commands.Cog):
         except InvalidActivityException:
             await interaction.response.send_message("Hmm.. Looks like that activity is invalid for that course/semester combo. Please check those and try again. If you're trying to track new sections being opened, use `/uoft track new` instead", ephemeral=True)
             return
+        except TTBAPIUnavailableException:
+            await interaction.response.send_message("UofT's timetable isn't responding right now, so the course can't be checked. Please try again in a few minutes", ephemeral=True)
+            return
         # Step Three: Check if the user has a profile setup
-        if not self.database.is_user_in_db(interaction.user.id):
+        if not await self.database.is_user_in_db(interaction.user.id):
             # Create a profile for the user, then set the embed footer as "Remember to setup your profile"
-            self.database.add_user_to_db(interaction.user.id, {})
-            self.database.add_blank_dlc(interaction.user.id)
-            footer = "Remember to setup your profile using /profile! Remaining free tracked activities: " + str(self.database.get_user_dlc(interaction.user.id)['max_tracked_activities'] - len(self.database.get_user_tracked_activities(interaction.user.id)) - 1)
+            await self.database.add_user_to_db(interaction.user.id, {})
+            await self.database.add_blank_dlc(interaction.user.id)
+            footer = "Remember to setup your profile using /profile! Remaining free tracked activities: " + str((await self.database.get_user_dlc(interaction.user.id))['max_tracked_activities'] - len(await self.database.get_user_tracked_activities(interaction.user.id)) - 1)
         else:
-            footer = "Remaining free tracked activities: " + str(self.database.get_user_dlc(interaction.user.id)['max_tracked_activities'] - len(self.database.get_user_tracked_activities(interaction.user.id)) - 1)
+            footer = "Remaining free tracked activities: " + str((await self.database.get_user_dlc(interaction.user.id))['max_tracked_activities'] - len(await self.database.get_user_tracked_activities(interaction.user.id)) - 1)
 
         # If we're here, then the course is valid, and we can add it to the database
         # But first, we need to check if the course is already in the database
-        if self.database.is_user_tracking_activity(interaction.user.id, course_code, session, activity):
+        if await self.database.is_user_tracking_activity(interaction.user.id, course_code, session, activity):
             await interaction.send("You are already tracking this course/activity combination", ephemeral=True)
             return
         # If the user's current tracked activities is greater than the allotted amount, don't allow them to add more
-        user_activites = self.database.get_user_tracked_activities(interaction.user.id)
-        user_dlc = self.database.get_user_dlc(interaction.user.id)
+        user_activites = await self.database.get_user_tracked_activities(interaction.user.id)
+        user_dlc = await self.database.get_user_dlc(interaction.user.id)
         if len(user_activites) == user_dlc['max_tracked_activities']:
             await interaction.response.send_message("You have reached the maximum amount of tracked activities. Please remove some activities before adding more, or consider upgrading your account to add more activities", ephemeral=True)
             return
 
-        self.database.add_tracked_activity(
+        await self.database.add_tracked_activity(
             interaction.user.id, course_code, session, activity)
         embed = nextcord.Embed(
             title="Course Added", description=f"Successfully added {course_code} {activity} to your tracked courses", color=nextcord.Color.blue())
@@ -220,9 +381,9 @@ class UofT(commands.Cog):
         description="The semester in which the course is offered. Example: Fall",
         choices={"Fall": "F", "Winter": "S", "Full Year": "Y"},
     ),):
-        if not self.database.is_user_in_db(interaction.user.id) or len(self.database.get_user_tracked_activities(interaction.user.id)) == 0:
+        if not await self.database.is_user_in_db(interaction.user.id) or len(await self.database.get_user_tracked_activities(interaction.user.id)) == 0:
             # If the user is not in the database or is not tracking any courses, send an error message
-            embed = build_embed_from_json("Embeds/no_tracked_courses.json")
+            embed = embed_templates.build("no_tracked_courses")
             await interaction.response.send_message(embed=embed)
             return
         course_code, activity = course_code.upper(), activity.upper()
@@ -231,27 +392,61 @@ class UofT(commands.Cog):
             await interaction.response.send_message("Invalid course code or activity code. Please try again.", ephemeral=True)
             return
         # Step 1: Check if the user is already tracking the course
-        if not self.database.is_user_tracking_activity(interaction.user.id, course_code, session, activity):
+        if not await self.database.is_user_tracking_activity(interaction.user.id, course_code, session, activity):
             await interaction.response.send_message("You aren't tracking this course!", ephemeral=True)
             return
         # Step 2: Remove the course from the database
-        self.database.remove_tracked_activity(
+        await self.database.remove_tracked_activity(
             interaction.user.id, course_code, session, activity)
         await interaction.response.send_message("Successfully removed the course from being tracked!", ephemeral=True)
 
+    @uoft.subcommand(name="history", description="View the enrolment trend of a course activity")
+    async def history_command(self, interaction: nextcord.Interaction, course_code: str = SlashOption(name="course_code", description="The course code of the course. Example: CSC148H5"), activity: str = SlashOption(name="activity", description="The activity code. Example: LEC0101"), session: str = SlashOption(
+        name="semester",
+        description="The semester in which the course is offered. Example: Fall",
+        choices={"Fall": "F", "Winter": "S", "Full Year": "Y"},
+    ),):
+        course_code, activity = course_code.upper(), activity.upper()
+        if not self.utils.validate_course(course_code, activity, session):
+            await interaction.response.send_message("Invalid course code/activity/semester combination. Please try again.", ephemeral=True)
+            return
+        # This only reads the stored history, so it never calls the TTB API
+        samples = self.history.get(course_code, session, activity)
+        if not samples:
+            await interaction.response.send_message("There's no enrolment history for that activity yet. History is only recorded for courses the bot polls.", ephemeral=True)
+            return
+        first, last = samples[0], samples[-1]
+        embed = nextcord.Embed(title=f"{course_code} {activity} Enrolment History",
+                               description=f"{len(samples)} changes recorded since <t:{int(first[0])}:f>", color=nextcord.Color.blue())
+        embed.add_field(name="Now", value=f"{last[1]}/{last[2]} enrolled, {last[3]} waitlisted", inline=True)
+        embed.add_field(name="Change", value=f"{last[1] - first[1]:+d} enrolled, {last[3] - first[3]:+d} waitlisted", inline=True)
+        embed.add_field(name="Range", value=f"{min(sample[1] for sample in samples)} to {max(sample[1] for sample in samples)} enrolled", inline=True)
+        embed.add_field(name="Trend", value=f"`{self._sparkline(samples[-30:])}`", inline=False)
+        embed.add_field(name="Latest Changes", value="\n".join(f"<t:{int(timestamp)}:R>: {current}/{maximum}, {waitlist} waitlisted" for timestamp, current, maximum, waitlist in reversed(samples[-5:])), inline=False)
+        await interaction.response.send_message(embed=embed)
+
+    def _sparkline(self, samples: list[tuple[float, int, int, int]]) -> str:
+        """
+        Returns a one-line chart of how full a section was in each sample
+        """
+        bars = "▁▂▃▄▅▆▇█"
+        return "".join(bars[min(len(bars) - 1, int(current / maximum * len(bars))) if maximum else 0] for _, current, maximum, _ in samples)
+
     @uoft.subcommand(name="list", description="List all the courses you are tracking")
     async def view_tracked(self, interaction: nextcord.Interaction):
-        if not self.database.is_user_in_db(interaction.user.id) or len(self.database.get_user_tracked_activities(interaction.user.id)) == 0:
-            embed = build_embed_from_json("Embeds/no_tracked_courses.json")
+        if not await self.database.is_user_in_db(interaction.user.id) or len(await self.database.get_user_tracked_activities(interaction.user.id)) == 0:
+            embed = embed_templates.build("no_tracked_courses")
             await interaction.response.send_message(embed=embed)
             return
-        activities = self.database.get_user_tracked_activities(
+        activities = await self.database.get_user_tracked_activities(
             interaction.user.id)
         embed = nextcord.Embed(title="Tracked Courses",
                                description="Here are all the courses you're tracking", color=nextcord.Color.blue())
         for activity in activities:
-            course_name = await self.ttbapi.get_course(activity['coursecode'], activity['semester'])
-            course_name = course_name.name
+            try:
+                course_name = (await self.ttbapi.get_course(activity['coursecode'], activity['semester'])).name
+            except (CourseNotFoundException, TTBAPIUnavailableException):
+                course_name = "Course name unavailable"
             embed.add_field(name=f"{activity['coursecode']} {activity['activity']} {activity['semester']}", value=course_name, inline=False)
 
         await interaction.response.send_message(embed=embed)
@@ -1,6 +1,6 @@
-import twilio.rest
 import dotenv
 import os
+import threading
 
 dotenv.load_dotenv("tokens.env")
 
@@ -11,34 +11,62 @@ class UserContact:
     Once a spot in their courses opens up
 
     Attributes:
-    twilio: twilio.rest.Client object which is used to send SMS messages to a user's phone number
+    twilio: twilio.rest.Client object which is used to send SMS messages to a user's phone number.
+    twilio is slow to import and rarely used, so the client is only created on first use (or by connect_in_background)
     """
 
     def __init__(self) -> None:
-        account_sid = 'AC2b1a7015a561484c6b94c1550f79c011'
-        auth_token = os.getenv("TWILIOAUTH")
-        self.twilio = twilio.rest.Client(account_sid, auth_token)
+        self._twilio = None
+        self._twilio_lock = threading.Lock()
 
         self.contact_methods = {
             "phone_number": self._process_phone_number,
         }
         self.version = "ContactCore V3.2"
 
-    def contact_user(self, user_profile: dict[str, str], message: str, dlc: dict) -> None:
+    @property
+    def twilio(self):
+        if self._twilio is None:
+            with self._twilio_lock:
+                if self._twilio is None:
+                    import twilio.rest
+                    account_sid = 'AC2b1a7015a561484c6b94c1550f79c011'
+                    auth_token = os.getenv("TWILIOAUTH")
+                    self._twilio = twilio.rest.Client(account_sid, auth_token)
+        return self._twilio
+
+    def connect_in_background(self, on_ready=None) -> None:
+        """
+        Creates the Twilio client on a background thread, then calls on_ready if given
+        """
+        def connect():
+            self.twilio
+            if on_ready is not None:
+                on_ready()
+        threading.Thread(target=connect, name="twilio-connect", daemon=True).start()
+
+    def contact_user(self, user_profile: dict[str, str], message: str, dlc: dict) -> list[str]:
         """
         Method which handles the profile of a user and contacts them
+        Returns the channels the user was contacted on ("sms", "call")
         """
+        channels = []
         for key, value in user_profile.items():
-            self.contact_methods.get(key, lambda str1, str2, str3: None)(value, message, dlc)
+            channels.extend(self.contact_methods.get(key, lambda str1, str2, str3: None)(value, message, dlc) or ())
+        return channels
 
-    def _process_phone_number(self, number: str, message: str, dlc: dict) -> None:
+    def _process_phone_number(self, number: str, message: str, dlc: dict) -> list[str]:
         if not number['confirmed']:
-            return
+            return []
+        channels = []
         if dlc['SMS_enabled'] and number['SMS']:
             self._send_sms(number['number'], message)
+            channels.append("sms")
         
         if dlc['call_enabled'] and number['call']:
             self._make_phonecall(number['number'], message)
+            channels.append("call")
+        return channels
         
     def confirm_user_number(self, number: str, confirmation_code: int):
         """
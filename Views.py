@@ -1,6 +1,6 @@
 from __future__ import annotations
 import nextcord
-from Mongo import Mongo
+from AsyncMongo import AsyncMongo
 
 class ConfirmDialogue(nextcord.ui.View):
     def init(self):
@@ -33,7 +33,7 @@ class NotificationToggleButton(nextcord.ui.Button):
         await interaction.edit_original_message(embed=embed, view=self.view_object)
 
 class NotificationsView(nextcord.ui.View):
-    def __init__(self, user_id: int, embed: nextcord.embeds.Embed, db: Mongo, buttons: list[tuple[str, str, str, int]]) -> None:
+    def __init__(self, user_id: int, embed: nextcord.embeds.Embed, db: AsyncMongo, buttons: list[tuple[str, str, str, int]]) -> None:
         super().__init__()
         self.user_id = user_id
         self.embed = embed
@@ -44,11 +44,11 @@ class NotificationsView(nextcord.ui.View):
         # Method which updates the database with the notification settings and 
         # Updates the embed with the new settings
         # Step one: Get the current profile
-        profile = self.db.get_user_profile(self.user_id)
+        profile = await self.db.get_user_profile(self.user_id)
         # Step two: Get the current submenu setting
         current_submenu_setting = profile[menu][submenu]
         # Update the database with the new setting
-        self.db.update_user_notifications(self.user_id, not current_submenu_setting, menu, submenu)
+        await self.db.update_user_notifications(self.user_id, not current_submenu_setting, menu, submenu)
         # Update the embed with the new setting
         self.embed.set_field_at(index, name=entry_name[7:], value=f"On" if not current_submenu_setting else "Off", inline=True)
         return self.embed
\ No newline at end of file
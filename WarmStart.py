@@ -0,0 +1,97 @@
+# File which contains the on-disk snapshot the bot warm-starts from after a restart
+from __future__ import annotations
+import json
+import os
+import struct
+import threading
+import time
+try:
+    # orjson encodes and decodes the snapshot's course records several times faster than the standard library
+    from orjson import dumps, loads
+except ImportError:
+    from json import loads
+
+    def dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+from Courses import Course
+from SectionState import SectionStateStore
+
+
+class WarmStartSnapshot:
+    """
+    Class which holds the latest polled courses and section states, saved to a local binary file
+    at shutdown and every few ticks. On startup the file is loaded straight away, so the course cache and
+    the vacancy detector don't start out empty. A loaded snapshot is stale until every course in it has been polled again
+    """
+    MAGIC = b"TTBW"
+    VERSION = 2
+    # Magic, version, saved at (epoch seconds), length of the course records, length of the section states
+    HEADER = struct.Struct("<4sHdII")
+
+    def __init__(self, courses: dict[tuple[str, str], Course] = None, section_states: SectionStateStore = None, stale: bool = False) -> None:
+        self.courses = courses if courses is not None else {}
+        self.section_states = section_states if section_states is not None else SectionStateStore()
+        # Courses loaded from disk which haven't been polled from the TTB API since
+        self.unconfirmed = set(self.courses) if stale else set()
+        # Held while saving, so a save at shutdown can't interleave with one still running in an executor
+        self.save_lock = threading.Lock()
+
+    @property
+    def stale(self) -> bool:
+        return bool(self.unconfirmed)
+
+    def confirm(self, keys) -> None:
+        """
+        Marks courses as freshly polled from the TTB API, and forgets unconfirmed courses which are no longer in the snapshot
+        """
+        self.unconfirmed.difference_update(keys)
+        self.unconfirmed.intersection_update(self.courses)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the snapshot as plain data: a header, the course records as JSON, then the section states' own format
+        """
+        courses = dumps([course.to_record() for course in self.courses.values()])
+        section_states = self.section_states.to_bytes()
+        return b"".join([self.HEADER.pack(self.MAGIC, self.VERSION, time.time(), len(courses), len(section_states)), courses, section_states])
+
+    def save(self, path: str) -> None:
+        """
+        Writes the snapshot to path, replacing the old file only once the new one is fully written
+        """
+        with self.save_lock:
+            data = self.to_bytes()
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str, max_age: float = 3600) -> WarmStartSnapshot:
+        """
+        Loads the snapshot saved at path and marks it stale, or returns an empty snapshot if there is no usable file,
+        or if the file was saved more than max_age seconds ago (a non-positive max_age accepts any age)
+        """
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            magic, version, saved_at, courses_length, section_states_length = cls.HEADER.unpack_from(data)
+            if magic != cls.MAGIC:
+                raise ValueError("Not a warm-start snapshot")
+            if version != cls.VERSION:
+                raise ValueError(f"Unsupported warm-start snapshot version {version}")
+            age = time.time() - saved_at
+            if 0 < max_age < age:
+                raise ValueError(f"The warm-start snapshot is {age / 60:.0f} minutes old")
+            offset = cls.HEADER.size
+            if len(data) != offset + courses_length + section_states_length:
+                raise ValueError("Truncated warm-start snapshot")
+            courses = {}
+            for record in loads(data[offset:offset + courses_length]):
+                course = Course.from_record(record)
+                courses[(course.course_code, course.semester)] = course
+            section_states = SectionStateStore.from_bytes(data[offset + courses_length:])
+            return cls(courses, section_states, stale=True)
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            print(f"Starting without a warm-start snapshot: {e}")
+            return cls()
@@ -0,0 +1,93 @@
+# File which contains the in-memory index of who is tracking what
+from __future__ import annotations
+import threading
+from typing import Iterable
+
+
+class WatchIndex:
+    """
+    Class which keeps an in-memory copy of the courses collection:
+    (course code, semester) -> activity -> set of subscribed user IDs.
+    It is loaded once at startup and then kept current by Mongo as users track and untrack activities
+    (and optionally by a change feed, so writes from other processes are seen too).
+    The poll loop reads only this index; the database is just the durable store
+    """
+
+    def __init__(self) -> None:
+        self.courses = {}
+        # Maps each course document's _id to its key, since change feed deletes only carry the _id
+        self.document_ids = {}
+        # Mongo writes from its thread pool while the poll loop reads, so every access takes the lock
+        self.lock = threading.Lock()
+
+    def load(self, documents: Iterable[dict]) -> None:
+        """
+        Replaces the index with the given course documents
+        """
+        with self.lock:
+            self.courses = {}
+            self.document_ids = {}
+            for document in documents:
+                self._replace_course(document)
+
+    def add(self, user_id: int, course_code: str, semester: str, activity: str) -> None:
+        """
+        Records that user_id is tracking the given activity
+        """
+        with self.lock:
+            self.courses.setdefault((course_code, semester), {}).setdefault(activity, set()).add(user_id)
+
+    def remove(self, user_id: int, course_code: str, semester: str, activity: str) -> None:
+        """
+        Records that user_id is no longer tracking the given activity
+        Activities and courses without any subscribers left are dropped from the index
+        """
+        with self.lock:
+            activities = self.courses.get((course_code, semester))
+            if activities is None or activity not in activities:
+                return
+            activities[activity].discard(user_id)
+            if not activities[activity]:
+                del activities[activity]
+            if not activities:
+                del self.courses[(course_code, semester)]
+
+    def replace_course(self, document: dict) -> None:
+        """
+        Replaces a single course with the given course document
+        """
+        with self.lock:
+            self._replace_course(document)
+
+    def remove_document(self, document_id) -> None:
+        """
+        Removes the course stored in the document with the given _id
+        """
+        with self.lock:
+            key = self.document_ids.pop(document_id, None)
+            if key is not None:
+                self.courses.pop(key, None)
+
+    def _replace_course(self, document: dict) -> None:
+        key = (document["course_code"], document["semester"])
+        if "_id" in document:
+            self.document_ids[document["_id"]] = key
+        activities = {activity: set(users) for activity, users in document.get("activities", {}).items() if users}
+        if activities:
+            self.courses[key] = activities
+        else:
+            self.courses.pop(key, None)
+
+    def snapshot(self) -> list[dict]:
+        """
+        Returns every tracked course in the same shape as Mongo.get_all_courses,
+        leaving out activities and courses nobody is tracking
+        """
+        with self.lock:
+            return [
+                {"course_code": course_code, "semester": semester, "activities": {activity: list(users) for activity, users in activities.items()}}
+                for (course_code, semester), activities in self.courses.items()
+            ]
+
+    def __len__(self) -> int:
+        return len(self.courses)
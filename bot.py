@@ -1,10 +1,13 @@
 from __future__ import annotations
+from StartupProfile import StartupTimer
+startup_timer = StartupTimer()
 import nextcord
 from nextcord.ext import commands, tasks
 import dotenv
 dotenv.load_dotenv("tokens.env")
 import os
-from Mongo import Mongo
+import json
+from AsyncMongo import AsyncMongo
 from UserContact import UserContact
 from CommonUtils import *
 from UofT import UofT
@@ -12,25 +15,67 @@ from Profiles import ProfilesCog
 import random
 from AdminCommands import AdminCommands
 from CommonUtils import get_most_recent_file_modified_time
+from EmbedTemplates import embed_templates
+import Metrics
+startup_timer.mark("imports")
 ttb = commands.Bot(command_prefix='ttb', intents=nextcord.Intents.all(), owner_id=516413751155621899)
 
 
 # ------------ GLOBAL OBJECTS AND VARIABLES ------------
+def connect_database():
+    """
+    Imports pymongo, connects to the database and loads the watch index. Runs on the database's thread pool,
+    in parallel with the Discord login
+    """
+    from Mongo import Mongo
+    if os.getenv("COMPUTERNAME"):
+        mongo = Mongo(os.getenv('PYMONGO'), "TTBTrackrDev")
+    else:
+        mongo = Mongo(os.getenv('PYMONGO'), "TTBTrackr")
+    mongo.start_change_feed()
+    startup_timer.mark("database connected")
+    return mongo
+
+database = AsyncMongo(connect_database)
 contact = UserContact()
-if os.getenv("COMPUTERNAME"):
-    database = Mongo(os.getenv('PYMONGO'), "TTBTrackrDev")
-else:
-    database = Mongo(os.getenv('PYMONGO'), "TTBTrackr")
+contact.connect_in_background(lambda: startup_timer.mark("twilio client ready"))
 ttb.add_cog(UofT(ttb, database, contact))
 ttb.add_cog(ProfilesCog(ttb, database, contact))
-# ttb.add_cog(AdminCommands(ttb, database))
+# Every admin command is restricted to the bot's owner by check_if_it_is_me
+ttb.add_cog(AdminCommands(ttb, database))
+startup_timer.mark("cogs added")
 
 VERSION = "TTBTrackr v2023.9.1PRERELEASE_BETA\n"
+# Computed once, since it walks the source tree
+LAST_PATCHED = int(get_most_recent_file_modified_time())
+startup_timer.mark("build stamp")
+# The /help about field values, filled in on the first call once every cog (and the database) is ready
+about_fields = None
 
 # ------------ BOT EVENTS ------------
+startup_reported = False
+# Serves the runtime metrics at http://127.0.0.1:METRICS_PORT/metrics, unless METRICS_PORT is 0
+metrics_server = Metrics.MetricsServer(Metrics.registry, port=int(os.getenv("METRICS_PORT", 9108)))
+
+async def on_connect():
+    startup_timer.mark("gateway connected")
+# A listener rather than @ttb.event, so nextcord's own on_connect (which syncs slash commands) still runs
+ttb.add_listener(on_connect, "on_connect")
+
 @ttb.event
 async def on_ready():
     print(f'{ttb.user} has connected to Discord!')
+    global startup_reported
+    if not startup_reported:
+        embed_templates.start(float(os.getenv("EMBED_RELOAD_SECONDS", 10)))
+        if metrics_server.port:
+            try:
+                await metrics_server.start()
+            except OSError as e:
+                print(f"Couldn't start the metrics endpoint on port {metrics_server.port}: {e}")
+        startup_timer.mark("on_ready")
+        print(startup_timer.report())
+        startup_reported = True
     await update_status()
 
     
@@ -48,26 +93,32 @@ async def help_profile(interaction: nextcord.Interaction):
     """
     Help with profiles
     """
-    await interaction.response.send_message(embed=build_embed_from_json("Embeds/profile_help.json"))
+    await interaction.response.send_message(embed=embed_templates.build("profile_help"))
 
 @help.subcommand(name="uoft", description="Get help with the UofT Module")
 async def help_uoft(interaction: nextcord.Interaction):
-    await interaction.response.send_message(embed=build_embed_from_json("Embeds/UofT_help.json"))
+    await interaction.response.send_message(embed=embed_templates.build("UofT_help"))
 
 @help.subcommand(name="about", description="Get information about TTBTrackr")
 async def about(interaction: nextcord.Interaction):
-    # Load the embed data from the JSON file
-    with open("Embeds/about.json", "r", encoding="utf-8") as file:
-        embed_data = json.load(file)
-    embed_data['fields'][0]['value'] = VERSION + f"Last patched <t:{int(get_most_recent_file_modified_time())}:R>"
-    for _, cog in ttb.cogs.items():
-        embed_data['fields'][1]['value'] += cog.version + "\n"
-    await interaction.response.send_message(embed=build_embed_from_json(embed_data))
+    global about_fields
+    if about_fields is None:
+        # ProfilesCog's version includes the database's, which would block the event loop until the database has connected
+        if not database.connection.done():
+            await interaction.response.defer()
+            await database.wait_until_connected()
+        module_information = "".join(cog.version + "\n" for cog in ttb.cogs.values() if hasattr(cog, "version"))
+        about_fields = {0: VERSION + f"Last patched <t:{LAST_PATCHED}:R>", 1: module_information}
+    embed = embed_templates.build("about", field_values=about_fields)
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed)
+    else:
+        await interaction.response.send_message(embed=embed)
 
 @help.subcommand(name="contact", description="Get information about TTBTrackr's Contact Methods")
 async def contact(interaction: nextcord.Interaction):
     vcard_file = nextcord.File("ttbtrackr.vcf")
-    await interaction.response.send_message("Tip: Add TTBTrackr to your contacts by downloading this VCard file!", embed=build_embed_from_json("Embeds/contact_info.json"), file=vcard_file)
+    await interaction.response.send_message("Tip: Add TTBTrackr to your contacts by downloading this VCard file!", embed=embed_templates.build("contact_info"), file=vcard_file)
 
 @tasks.loop(minutes=30)
 async def update_status():
@@ -81,6 +132,7 @@ async def update_status():
 update_status.start()
     
 computer_name = os.getenv('COMPUTERNAME')
+startup_timer.mark("discord login started")
 if computer_name:
     ttb.run(os.getenv('DEVTOKEN'))
 else: